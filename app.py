@@ -1,70 +1,270 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory
-from condo_extractor import extract_listing_data, get_centris_id_from_url, get_cached_data
+"""Web app: listing extraction, the price chart and its data API.
+
+Build it with create_app().  Locally, `python app.py` runs the Flask
+development server; in production run it under a multi-worker WSGI server:
+
+    gunicorn -w 4 --threads 8 'app:create_app()'
+
+Workers share the SQLite store, the photo store and the page archive,
+which are written atomically and with per-listing advisory locks.
+Extraction jobs live in the worker that accepted them.
+
+Each open event stream (/api/listings/events, /jobs/events) holds a worker
+thread for as long as the browser keeps it open, so a worker serves at most
+EVENT_STREAMS_MAX of them at once and answers more with 503 and a
+Retry-After header.  Keep it below --threads so that other requests always
+find a free thread.
+"""
+from flask import (Blueprint, Flask, current_app, render_template, request, jsonify, send_from_directory,
+                   stream_with_context, redirect, g)
+from carrying_costs import (MAX_SCENARIOS, CarryingCosts, ScenarioGrid, listing_costs, parse_values,
+                            scenario_summary)
+from chart_data import ENCODINGS, MAX_CHART_POINTS, Y_COLUMNS
+from comparables import ComparablesIndex
+from condo_extractor import LISTING_CACHE, get_centris_id_from_url
+from extraction_jobs import FINISHED, ExtractionJobs, QueueFullError
+from listing_export import FORMATS, export_listings, parse_export_query
+from listing_feed import LISTING_FEED
+from listing_index import ListingIndex
+from listing_query import parse_listing_query, stream_data_points
+from listing_store import get_store
+from metrics import HTTP_REQUESTS, HTTP_SECONDS, configure_logging, log_event, render as render_metrics
+from photos import PHOTO_DIR, thumbnail_path
+import math
 import re
-import os
-import json
+import threading
+import time
+
+# Overridden by ESTATE_* environment variables (e.g. ESTATE_EXTRACT_WORKERS=8),
+# then by the mapping passed to create_app()
+DEFAULT_CONFIG = {
+    'EXTRACT_WORKERS': 4,
+    'EXTRACT_MAX_PENDING': 100,
+    'EXTRACT_RATE': 2.0,
+    # Seconds POST /extract waits for its job before answering 202 with the job id
+    'EXTRACT_WAIT_TIMEOUT': 60,
+    'INDEX_CHECK_INTERVAL': 1.0,
+    'CHART_MAX_POINTS': 5000,
+    # Event streams open at once per worker, each holding one of its threads
+    'EVENT_STREAMS_MAX': 4,
+}
+
+bp = Blueprint('estate', __name__)
+
+CENTRIS_URL_RE = re.compile(r'^https?://(?:www\.)?centris\.ca/fr/')
+PHOTO_MAX_AGE = 365 * 24 * 3600
+# Seconds a client turned away for too many event streams should wait
+EVENT_STREAM_RETRY_AFTER = 30
+LEGACY_PHOTO_RE = re.compile(r'\d+\.jpe?g')
+
+
+def create_app(config=None):
+    """Create the Flask app with its own listing index and extraction job pool."""
+    app = Flask(__name__)
+    app.config.update(DEFAULT_CONFIG)
+    app.config.from_prefixed_env('ESTATE')
+    if config:
+        app.config.update(config)
+
+    configure_logging()
+    app.extensions['listing_index'] = ListingIndex(check_interval=app.config['INDEX_CHECK_INTERVAL'],
+                                                   chart_max_points=app.config['CHART_MAX_POINTS'])
+    app.extensions['comparables'] = ComparablesIndex(check_interval=app.config['INDEX_CHECK_INTERVAL'])
+    app.extensions['carrying_costs'] = CarryingCosts(check_interval=app.config['INDEX_CHECK_INTERVAL'])
+    app.extensions['extraction_jobs'] = ExtractionJobs(max_workers=app.config['EXTRACT_WORKERS'],
+                                                       max_pending=app.config['EXTRACT_MAX_PENDING'],
+                                                       rate=app.config['EXTRACT_RATE'])
+    app.extensions['event_streams'] = threading.BoundedSemaphore(app.config['EVENT_STREAMS_MAX'])
+    app.register_blueprint(bp)
+    return app
+
+
+def listing_index():
+    return current_app.extensions['listing_index']
+
 
-app = Flask(__name__)
+def comparables_index():
+    return current_app.extensions['comparables']
 
-@app.route('/')
+
+def extraction_jobs():
+    return current_app.extensions['extraction_jobs']
+
+def event_stream(events):
+    """Stream server-sent events, or answer 503 if this worker has EVENT_STREAMS_MAX streams open."""
+    slots = current_app.extensions['event_streams']
+    if not slots.acquire(blocking=False):
+        return (jsonify({'error': 'Too many open event streams, retry later'}), 503,
+                {'Retry-After': str(EVENT_STREAM_RETRY_AFTER)})
+    response = current_app.response_class(stream_with_context(events), mimetype='text/event-stream',
+                                          headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Called by the WSGI server once the stream ends or the client goes away
+    response.call_on_close(slots.release)
+    return response
+
+@bp.before_app_request
+def start_timer():
+    g.start_time = time.perf_counter()
+
+@bp.after_app_request
+def record_request(response):
+    duration = time.perf_counter() - g.get('start_time', time.perf_counter())
+    endpoint = request.endpoint or 'unknown'
+    HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    HTTP_SECONDS.observe(duration, endpoint=endpoint)
+    log_event('request', method=request.method, path=request.path, status=response.status_code,
+              duration_ms=round(duration * 1000, 1), cache=g.get('cache'),
+              centris_id=g.get('centris_id') or (request.view_args or {}).get('centris_id'))
+    return response
+
+@bp.route('/metrics')
+def metrics():
+    return current_app.response_class(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+@bp.route('/api/cache-stats')
+def cache_stats():
+    return jsonify(LISTING_CACHE.stats())
+
+@bp.route('/')
 def index():
     return render_template('index.html')
 
-@app.route('/chart')
+@bp.route('/chart')
 def chart():
     return render_template('chart.html')
 
-@app.route('/data/<path:filename>')
+@bp.route('/data/<filename>')
 def serve_data(filename):
+    # Only legacy photos (data/{centris_id}.jpeg); the database, page archive
+    # and lock files live in the same directory and must not be served
+    if not LEGACY_PHOTO_RE.fullmatch(filename):
+        return jsonify({'error': 'Not found'}), 404
     return send_from_directory('data', filename)
 
-@app.route('/api/property-data')
+@bp.route('/data/photos/<filename>')
+def serve_photo(filename):
+    # Photo file names are content hashes, so they can be cached forever
+    response = send_from_directory(PHOTO_DIR, filename, max_age=PHOTO_MAX_AGE)
+    response.headers['Cache-Control'] = f'public, max-age={PHOTO_MAX_AGE}, immutable'
+    response.set_etag(filename.split('.')[0])
+    return response.make_conditional(request)
+
+@bp.route('/listing-photo/<centris_id>/<size>')
+def listing_photo(centris_id, size):
+    # Stable per-listing URL that redirects to the current content-hashed file
+    record = get_store().get(centris_id)
+    path = thumbnail_path(record, size) if record else None
+    if not path:
+        return jsonify({'error': 'No photo for this listing'}), 404
+    response = redirect(f'/data/{path}')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@bp.route('/api/property-data')
 def property_data():
-    data_points = []
-    data_dir = 'data'
-    
-    # Read all JSON files in the data directory
-    for filename in os.listdir(data_dir):
-        if filename.endswith('.json'):
-            file_path = os.path.join(data_dir, filename)
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    property_data = json.load(f)
-                    
-                    # Only include if we have price
-                    price = property_data.get('price')
-                    terrain = property_data.get('municipal_terrain')
-                    building = property_data.get('municipal_building')
-                    sqft = property_data.get('sqft')
-                    
-                    if price:
-                        total_assessment = None
-                        if terrain and building:
-                            total_assessment = int(terrain) + int(building)
-                            
-                        centris_id = property_data.get('centris_id', '')
-                        
-                        # Check if photo exists in data directory
-                        photo_path = None
-                        if centris_id:
-                            if os.path.exists(os.path.join('data', f'{centris_id}.jpeg')):
-                                photo_path = f'{centris_id}.jpeg'
-                        
-                        data_points.append({
-                            'price': int(price),
-                            'assessment': total_assessment,
-                            'sqft': sqft,
-                            'price_per_sqft': round(int(price) / int(sqft)) if sqft else None,
-                            'address': property_data.get('address', 'Unknown'),
-                            'centris_id': centris_id,
-                            'photo_path': photo_path
-                        })
-            except Exception as e:
-                print(f"Error reading {filename}: {str(e)}")
-    
-    return jsonify(data_points)
+    # Filtered, projected, sorted or paginated requests are answered by the store
+    if request.args:
+        try:
+            query = parse_listing_query(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return current_app.response_class(stream_with_context(stream_data_points(get_store(), query)),
+                                  mimetype='application/json')
+
+    # The full data set is served from the in-memory index; clients revalidate with If-None-Match
+    body, etag = listing_index().snapshot()
+    response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+@bp.route('/api/chart-data')
+def chart_data():
+    # Columnar chart payload, downsampled past max_points; clients revalidate with If-None-Match
+    y = request.args.get('y', 'assessment')
+    if y not in Y_COLUMNS:
+        return jsonify({'error': f"y must be one of {', '.join(Y_COLUMNS)}"}), 400
+    encoding = request.args.get('encoding', 'json')
+    if encoding not in ENCODINGS:
+        return jsonify({'error': f"encoding must be one of {', '.join(ENCODINGS)}"}), 400
+    try:
+        max_points = int(request.args.get('max_points', current_app.config['CHART_MAX_POINTS']))
+    except ValueError:
+        return jsonify({'error': 'max_points must be an integer'}), 400
+    max_points = min(max(max_points, 1), MAX_CHART_POINTS)
+
+    body, etag = listing_index().chart_snapshot(y, max_points, encoding)
+    response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+@bp.route('/api/export')
+def export():
+    # Every listing matching the /api/property-data filters, streamed as CSV, JSON Lines or Parquet
+    try:
+        query = parse_export_query(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    mimetype, extension = FORMATS[query['format']]
+    return current_app.response_class(stream_with_context(export_listings(get_store(), query)), mimetype=mimetype,
+                                      headers={'Content-Disposition': f'attachment; filename=listings.{extension}'})
+
+@bp.route('/api/listings/events')
+def listing_events():
+    # Chart data points of listings saved from now on (or since Last-Event-ID on reconnect)
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    return event_stream(LISTING_FEED.stream(int(last_event_id) if last_event_id.isdigit() else None))
+
+@bp.route('/api/listings/<centris_id>/history')
+def listing_history(centris_id):
+    record = get_store().get(centris_id)
+    if record is None:
+        return jsonify({'error': 'Unknown listing'}), 404
+    return jsonify({'centris_id': centris_id, 'current': record, 'history': get_store().history(centris_id)})
+
+@bp.route('/api/comparables/<centris_id>')
+def comparables(centris_id):
+    try:
+        n = min(max(int(request.args.get('n', 10)), 1), 100)
+    except ValueError:
+        return jsonify({'error': 'n must be an integer'}), 400
+    results = comparables_index().comparables(centris_id, n)
+    if results is None:
+        return jsonify({'error': 'Unknown listing or no comparable features'}), 404
+    return jsonify({'centris_id': centris_id, 'comparables': results})
+
+@bp.route('/api/carrying-costs')
+def carrying_costs():
+    # Scenario grid from rates (%), down payments (fractions) and amortization years;
+    # with ids, every scenario for those listings, otherwise per-scenario statistics
+    try:
+        grid = ScenarioGrid(parse_values(request.args.get('rates', '5')),
+                            parse_values(request.args.get('down', '0.2')),
+                            parse_values(request.args.get('years', '25')))
+        budget = float(request.args['budget']) if request.args.get('budget') else None
+        if budget is not None and not math.isfinite(budget):
+            raise ValueError("budget must be a finite number")
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if len(grid) > MAX_SCENARIOS:
+        return jsonify({'error': f'At most {MAX_SCENARIOS} scenarios per request'}), 400
+
+    listings = current_app.extensions['carrying_costs'].arrays()
+    ids = [centris_id for centris_id in request.args.get('ids', '').split(',') if centris_id]
+    if ids:
+        scenarios = [grid.describe(j) for j in range(len(grid))]
+        return jsonify({'scenarios': scenarios, 'listings': listing_costs(listings.subset(ids), grid)})
+    return jsonify({'listings': len(listings), 'scenarios': scenario_summary(listings, grid, budget=budget)})
+
+@bp.route('/api/price-drops')
+def price_drops():
+    try:
+        limit = min(int(request.args.get('limit', 100)), 1000)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    return jsonify(get_store().price_drops(since=request.args.get('since'), limit=limit))
 
-@app.route('/extract', methods=['POST'])
+@bp.route('/extract', methods=['POST'])
 def extract():
     url = request.form.get('url', '').strip()
     
@@ -72,24 +272,71 @@ def extract():
     if not url:
         return jsonify({'error': 'URL is required'}), 400
         
-    if not re.match(r'^https?://(?:www\.)?centris\.ca/fr/', url):
+    if not CENTRIS_URL_RE.match(url):
         return jsonify({'error': 'Invalid Centris URL. Please enter a valid Centris listing URL.'}), 400
     
+    g.centris_id = get_centris_id_from_url(url)
+
+    # Synchronous variant of POST /jobs: runs on the job pool (joining any job
+    # already in flight for this listing) and waits for the result
     try:
-        # Check if data is already cached
-        centris_id = get_centris_id_from_url(url)
-        cached_data = get_cached_data(centris_id) if centris_id else None
-        
-        # Get data (either from cache or web)
-        data = extract_listing_data(url)
-        
-        return jsonify({
-            'success': True,
-            'data': data,
-            'fromCache': cached_data is not None
-        })
+        job_id = extraction_jobs().submit(url)['job_id']
+        job = extraction_jobs().wait(job_id, timeout=current_app.config['EXTRACT_WAIT_TIMEOUT'])
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         return jsonify({'error': f'Failed to extract data: {str(e)}'}), 500
 
+    if job is None:
+        return jsonify({'error': 'Failed to extract data: the job expired'}), 500
+    if job['status'] not in FINISHED:
+        # Still running: the client can follow the job, or post again to join it
+        return jsonify({'job_id': job_id, 'status': job['status']}), 202, {'Location': f'/jobs/{job_id}'}
+
+    g.cache = 'hit' if job['fromCache'] else 'miss'
+    if job['status'] == 'failed':
+        return jsonify({'error': f"Failed to extract data: {job['error']}"}), 500
+    return jsonify({
+        'success': True,
+        'data': job['data'],
+        'fromCache': job['fromCache']
+    })
+
+@bp.route('/jobs', methods=['POST'])
+def submit_jobs():
+    # Accept one or more URLs as form fields or as a JSON {"urls": [...]} body
+    if request.is_json:
+        urls = (request.get_json(silent=True) or {}).get('urls') or []
+    else:
+        urls = request.form.getlist('url')
+    urls = [url.strip() for url in urls if isinstance(url, str) and url.strip()]
+
+    if not urls:
+        return jsonify({'error': 'URL is required'}), 400
+
+    invalid = [url for url in urls if not CENTRIS_URL_RE.match(url) or not get_centris_id_from_url(url)]
+    if invalid:
+        return jsonify({'error': f'Invalid Centris URL: {invalid[0]}. Please enter a valid Centris listing URL.'}), 400
+
+    try:
+        submitted = [extraction_jobs().submit(url) for url in urls]
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 503
+    return jsonify({'jobs': submitted}), 202
+
+@bp.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = extraction_jobs().get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job)
+
+@bp.route('/jobs/events')
+def job_events():
+    job_ids = [job_id for job_id in request.args.get('ids', '').split(',') if job_id]
+    if not job_ids:
+        return jsonify({'error': 'ids is required'}), 400
+    return event_stream(extraction_jobs().stream_events(job_ids))
+
 if __name__ == '__main__':
-    app.run(debug=True)
+    create_app().run(debug=True)
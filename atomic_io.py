@@ -0,0 +1,73 @@
+"""Crash-safe writes and cross-process locks for the data directory.
+
+atomic_write() writes to a temporary file next to the target and renames it
+into place, so other processes (web workers, a batch run) never read a
+partly written file and a crash never leaves one behind.
+
+file_lock() and listing_lock() are advisory locks (flock) shared by every
+process working on the same data directory.  Listing locks are striped over
+LOCK_STRIPES files rather than one file per listing.  Where fcntl is not
+available the locks only exclude threads of the same process.
+"""
+import os
+import tempfile
+import threading
+import zlib
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+LOCK_DIR = os.path.join('data', 'locks')
+LOCK_STRIPES = 1024
+
+# Fallback for platforms without fcntl: path -> threading.Lock
+_thread_locks = {}
+_thread_locks_lock = threading.Lock()
+
+
+def atomic_write(path, content):
+    """Write bytes to path through a temporary file and an atomic rename."""
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates the file readable by the owner only
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive advisory lock on path (created if needed) for the block."""
+    if fcntl is None:
+        with _thread_locks_lock:
+            lock = _thread_locks.setdefault(path, threading.Lock())
+        with lock:
+            yield
+        return
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'ab') as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def listing_lock(centris_id, lock_dir=LOCK_DIR):
+    """Advisory lock serializing work on one listing across processes."""
+    stripe = zlib.crc32(str(centris_id).encode('utf-8')) % LOCK_STRIPES
+    return file_lock(os.path.join(lock_dir, f'{stripe:04d}.lock'))
@@ -0,0 +1,171 @@
+"""Bulk concurrent extraction of Centris listings.
+
+Reads a file of Centris IDs or listing URLs (one per line, '#' comments
+allowed) and runs extract_listing_data over them with a thread pool that
+shares one pooled requests session.  Requests are rate limited per host and
+retried with exponential backoff; finished items are appended to a progress
+file so an interrupted run can be resumed.
+
+    python batch_extract.py ids.txt --concurrency 8 --rate 2 --progress progress.jsonl
+
+With --stale, every stored listing not checked within the cache TTL is
+revalidated too (conditional requests, so unchanged pages are cheap).
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from condo_extractor import CACHE_TTL, HEADERS, build_centris_url, extract_listing_data, get_centris_id_from_url
+from listing_pipeline import REQUEST_TIMEOUT
+from listing_store import get_store
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def read_batch_file(path):
+    """Read Centris IDs or URLs from a file and return the list of listing URLs."""
+    urls = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            entry = line.strip()
+            if not entry or entry.startswith('#'):
+                continue
+            urls.append(build_centris_url(entry) if entry.isdigit() else entry)
+    return urls
+
+
+class HostRateLimiter:
+    """Allow at most `rate` requests per second to each host."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_slot = {}
+        self.lock = threading.Lock()
+
+    def wait(self, url):
+        if not self.interval:
+            return
+        host = urlparse(url).netloc
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class BatchSession(requests.Session):
+    """Pooled session that rate limits and retries every request it makes.
+
+    Requests without an explicit timeout get `timeout`, so a stalled
+    connection raises requests.Timeout and is retried like other failures.
+    """
+
+    def __init__(self, pool_size=10, rate=None, retries=3, backoff=0.5, timeout=REQUEST_TIMEOUT):
+        super().__init__()
+        self.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.mount('http://', adapter)
+        self.mount('https://', adapter)
+        self.limiter = HostRateLimiter(rate)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+    def request(self, method, url, *args, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        attempt = 0
+        while True:
+            self.limiter.wait(url)
+            try:
+                resp = super().request(method, url, *args, **kwargs)
+                if resp.status_code not in RETRY_STATUSES or attempt >= self.retries:
+                    return resp
+                resp.close()
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.retries:
+                    raise
+            time.sleep(self.backoff * 2 ** attempt)
+            attempt += 1
+
+
+def load_progress(path):
+    """Return the set of URLs already extracted according to the progress file."""
+    done = set()
+    if path and os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Ignore a line truncated by an interrupted run
+                    continue
+                if entry.get('status') == 'ok':
+                    done.add(entry['url'])
+    return done
+
+
+def run_batch(urls, concurrency=4, rate=None, retries=3, backoff=0.5, progress_path=None):
+    """Extract every URL concurrently and return {'ok': n, 'failed': n, 'skipped': n}."""
+    done = load_progress(progress_path)
+    pending = [url for url in dict.fromkeys(urls) if url not in done]
+    summary = {'ok': 0, 'failed': 0, 'skipped': len(urls) - len(pending)}
+    progress_lock = threading.Lock()
+
+    def record(entry):
+        with progress_lock:
+            summary[entry['status']] += 1
+            if progress_path:
+                with open(progress_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    with BatchSession(pool_size=concurrency, rate=rate, retries=retries, backoff=backoff) as session:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = {pool.submit(extract_listing_data, url, session): url for url in pending}
+            for future in as_completed(futures):
+                url = futures[future]
+                entry = {'url': url, 'centris_id': get_centris_id_from_url(url)}
+                try:
+                    future.result()
+                    entry['status'] = 'ok'
+                except Exception as e:
+                    entry['status'] = 'failed'
+                    entry['error'] = str(e)
+                    print(f"Failed to extract {url}: {str(e)}")
+                record(entry)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract many Centris listings concurrently.")
+    parser.add_argument('input', nargs='?', help="file with one Centris ID or listing URL per line")
+    parser.add_argument('--stale', action='store_true',
+                        help="also revalidate every stored listing not checked within the cache TTL")
+    parser.add_argument('--concurrency', type=int, default=4, help="number of listings fetched at once")
+    parser.add_argument('--rate', type=float, default=2.0, help="max requests per second per host (0 = unlimited)")
+    parser.add_argument('--retries', type=int, default=3, help="retries for failed or throttled requests")
+    parser.add_argument('--backoff', type=float, default=0.5, help="initial retry delay in seconds, doubled each retry")
+    parser.add_argument('--progress', help="progress file used to resume an interrupted run")
+    args = parser.parse_args(argv)
+
+    if not args.input and not args.stale:
+        parser.error("give an input file and/or --stale")
+    urls = read_batch_file(args.input) if args.input else []
+    if args.stale:
+        urls += get_store().stale_urls((datetime.now() - CACHE_TTL).isoformat())
+    summary = run_batch(urls, concurrency=args.concurrency, rate=args.rate, retries=args.retries,
+                        backoff=args.backoff, progress_path=args.progress)
+    print(f"Extracted {summary['ok']}, failed {summary['failed']}, skipped {summary['skipped']}")
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
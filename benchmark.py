@@ -0,0 +1,267 @@
+"""Offline benchmarks for extraction and the chart API.
+
+Runs without network access, using soup_output.html plus synthetic pages,
+and generated stores of 1k/10k/100k listings:
+
+    python benchmark.py --sizes 1000,10000,100000 --output benchmark_results.json
+
+Measures extract_listing_data stage by stage (parse per backend, text
+flattening, address, element fields and each text field spec), the
+normalize_text/extract_number micro-costs, and /api/property-data,
+/api/chart-data and /api/comparables requests per second and peak traced
+memory through the Flask test client.  Results
+are written as JSON so runs can be compared.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import condo_extractor
+import html_parser
+import listing_store
+from condo_extractor import (
+    ELEMENT_FIELD_SPECS, TEXT_FIELD_SPECS, CARACTERISTIQUES_RE, extract_address, extract_field,
+    extract_number, normalize_text, parse_listing_fields,
+)
+from html_parser import make_soup, parser_available
+
+FIXTURE_PAGE = 'soup_output.html'
+
+SYNTHETIC_PAGE = """<html><head><meta property="og:title" content="{number}, Rue Sainte-Catherine Ouest, app. {unit}"></head>
+<body><h2>{number}, Rue Sainte-Catherine Ouest, app. {unit}</h2>
+<div class="price">{price} $</div><div class="cac">{bedrooms} chambres</div><div class="sdb">{bathrooms} salle de bain</div>
+<div><span>Caractéristiques</span><div>Superficie nette {sqft} pc</div><div>Année de construction {year}</div></div>
+<div>Évaluation municipale Terrain {terrain} $ Bâtiment {building} $ Total {total} $</div>
+<div>Taxes Municipales ({year_tax}) {municipal} $ Scolaires ({year_tax}) {school} $</div>
+<div>Dépenses Frais de copropriété {fee} $</div>
+{filler}
+</body></html>"""
+
+
+def timed(fn, *args, repeat=20):
+    """Run fn repeatedly; return timing stats in milliseconds and the last result."""
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        'mean_ms': statistics.mean(samples),
+        'median_ms': statistics.median(samples),
+        'min_ms': min(samples),
+        'max_ms': max(samples),
+        'repeat': repeat,
+    }, result
+
+
+def synthetic_page(rng, filler_paragraphs=0):
+    price = rng.randrange(200_000, 2_000_000, 1000)
+    terrain = rng.randrange(50_000, 200_000, 100)
+    building = rng.randrange(200_000, 900_000, 100)
+    filler = '\n'.join(f'<p>Paragraphe {i} : Lorem ipsum dolor sit amet, 12 rue.</p>' for i in range(filler_paragraphs))
+
+    def amount(value):
+        # French formatting: "1 234 567"
+        return f'{value:,}'.replace(',', '\xa0')
+
+    return SYNTHETIC_PAGE.format(
+        number=rng.randrange(100, 3000), unit=rng.randrange(100, 2500), price=amount(price),
+        bedrooms=rng.randrange(1, 4), bathrooms=rng.randrange(1, 3), sqft=rng.randrange(400, 2000),
+        year=rng.randrange(1960, 2025), terrain=amount(terrain), building=amount(building),
+        total=amount(terrain + building), year_tax=2025, municipal=amount(rng.randrange(2000, 9000)),
+        school=amount(rng.randrange(200, 900)), fee=amount(rng.randrange(2000, 15000)), filler=filler,
+    )
+
+
+def bench_extraction(pages, repeat):
+    """Per-stage latency of the extraction for each page."""
+    results = {}
+    for name, html in pages.items():
+        stages = {'size_bytes': len(html.encode('utf-8')), 'parse': {}}
+        for parser in html_parser.PREFERRED_PARSERS:
+            if parser_available(parser):
+                stages['parse'][parser], _ = timed(make_soup, html, parser, repeat=repeat)
+
+        soup = make_soup(html)
+        stages['flatten_page'], page_text = timed(lambda: normalize_text(soup.get_text()), repeat=repeat)
+
+        def flatten_section():
+            caracteristiques = soup.find(string=CARACTERISTIQUES_RE)
+            section = caracteristiques.find_parent() if caracteristiques else None
+            return normalize_text(section.get_text()) if section else ''
+        stages['flatten_section'], section_text = timed(flatten_section, repeat=repeat)
+
+        stages['address'], _ = timed(extract_address, soup, repeat=repeat)
+        stages['element_fields'], _ = timed(
+            lambda: [soup.find(class_=css_class) for _, css_class in ELEMENT_FIELD_SPECS], repeat=repeat)
+
+        texts = {'page': page_text, 'section': section_text}
+        stages['text_fields'] = {}
+        for spec in TEXT_FIELD_SPECS:
+            stages['text_fields'][spec['field']], _ = timed(extract_field, spec, texts, repeat=repeat)
+
+        stages['parse_listing_fields'], _ = timed(parse_listing_fields, soup, repeat=repeat)
+        stages['end_to_end'], _ = timed(lambda: parse_listing_fields(make_soup(html)), repeat=repeat)
+        results[name] = stages
+    return results
+
+
+def bench_micro(repeat):
+    """Micro-costs of the text helpers, per call in microseconds."""
+    samples = {
+        'normalize_text_short': (normalize_text, '  Superficie\xa0nette\n\t 1 421 pc  '),
+        'normalize_text_long': (normalize_text, ' Lorem\xa0ipsum\n\tdolor ' * 2000),
+        'extract_number': (extract_number, 'Frais de copropriété 11 388 $'),
+        'extract_number_none': (extract_number, 'aucun montant'),
+    }
+    results = {}
+    loops = 2000
+    for name, (fn, arg) in samples.items():
+        stats, _ = timed(lambda: [fn(arg) for _ in range(loops)], repeat=repeat)
+        results[name] = {'mean_us': stats['mean_ms'] * 1000 / loops, 'min_us': stats['min_ms'] * 1000 / loops}
+    return results
+
+
+def generate_records(count, rng):
+    """Yield (centris_id, record) pairs shaped like extracted listings."""
+    for i in range(count):
+        centris_id = str(10_000_000 + i)
+        terrain = rng.randrange(50_000, 200_000, 100)
+        building = rng.randrange(200_000, 900_000, 100)
+        yield centris_id, {
+            'address': f'{rng.randrange(100, 3000)}, Rue Sainte-Catherine Ouest, app. {rng.randrange(100, 2500)}',
+            'price': str(rng.randrange(200_000, 2_000_000, 1000)),
+            'bedrooms': str(rng.randrange(1, 4)),
+            'bathrooms': str(rng.randrange(1, 3)),
+            'sqft': str(rng.randrange(400, 2000)),
+            'year_of_construction': str(rng.randrange(1960, 2025)),
+            'municipal_assessment_total': str(terrain + building),
+            'municipal_terrain': str(terrain),
+            'municipal_building': str(building),
+            'taxes_municipal': str(rng.randrange(150, 800)),
+            'taxes_school': str(rng.randrange(20, 80)),
+            'condo_fee': str(rng.randrange(200, 1500)),
+            'url': condo_extractor.build_centris_url(centris_id),
+            'centris_id': centris_id,
+            'extraction_date': datetime.now().isoformat(),
+            'photo_url': None,
+            'photo_path': None,
+            'photo_thumbnails': None,
+        }
+
+
+def bench_api(sizes, requests_per_size, rng):
+    """Requests per second and peak memory of /api/property-data for each store size."""
+    import app as app_module
+
+    results = {}
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = listing_store.ListingStore(os.path.join(tmp, 'listings.db'))
+            start = time.perf_counter()
+            records = list(generate_records(size, rng))
+            for offset in range(0, size, 5000):
+                store.save_many(records[offset:offset + 5000])
+            del records
+            generate_s = time.perf_counter() - start
+
+            # Point the app at the generated store
+            listing_store._store = store
+            client = app_module.create_app().test_client()
+
+            size_results = {'generate_s': generate_s}
+            queries = {
+                'full_cold': None,
+                'full_warm': '',
+                'full_not_modified': '',
+                'filtered': 'min_price=500000&max_price=900000&min_sqft=800&fields=price,sqft,centris_id',
+                'paginated': 'sort=-price&limit=100',
+                'chart_columns': 'y=assessment&encoding=binary',
+                'comparables': None,
+            }
+            etag = None
+            for name, query in queries.items():
+                n = 1 if name == 'full_cold' else requests_per_size
+                headers = {'If-None-Match': etag} if name == 'full_not_modified' and etag else {}
+                if name == 'comparables':
+                    url = f'/api/comparables/{10_000_000 + size // 2}?n=10'
+                    client.get(url)  # builds the tree
+                elif name.startswith('chart_'):
+                    url = f'/api/chart-data?{query}'
+                    client.get(url)  # builds the payload
+                else:
+                    url = '/api/property-data' + (f'?{query}' if query else '')
+                start = time.perf_counter()
+                for _ in range(n):
+                    response = client.get(url, headers=headers)
+                    payload = len(response.get_data())
+                elapsed = time.perf_counter() - start
+
+                # Peak memory is traced on a separate request, tracing slows requests down
+                tracemalloc.start()
+                client.get(url, headers=headers).get_data()
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                if name == 'full_warm':
+                    etag = response.headers.get('ETag')
+                size_results[name] = {
+                    'requests': n,
+                    'requests_per_s': n / elapsed if elapsed else None,
+                    'mean_ms': elapsed * 1000 / n,
+                    'status': response.status_code,
+                    'payload_bytes': payload,
+                    'peak_traced_mb': peak / 1e6,
+                }
+            results[str(size)] = size_results
+            listing_store._store = None
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the offline benchmarks.")
+    parser.add_argument('--sizes', default='1000,10000,100000', help="comma-separated store sizes for the API benchmark")
+    parser.add_argument('--repeat', type=int, default=20, help="repetitions per extraction measurement")
+    parser.add_argument('--requests', type=int, default=20, help="requests per API measurement")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='benchmark_results.json', help="JSON results file")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    pages = {'synthetic_small': synthetic_page(rng), 'synthetic_large': synthetic_page(rng, filler_paragraphs=5000)}
+    if os.path.exists(FIXTURE_PAGE):
+        with open(FIXTURE_PAGE, 'r', encoding='utf-8') as f:
+            pages['soup_output'] = f.read()
+
+    results = {
+        'run': {
+            'date': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'parser': html_parser.PARSER,
+            'seed': args.seed,
+        },
+        'extraction': bench_extraction(pages, args.repeat),
+        'micro': bench_micro(args.repeat),
+        'api': bench_api([int(size) for size in args.sizes.split(',') if size], args.requests, rng),
+    }
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    for name, stages in results['extraction'].items():
+        print(f"{name}: {stages['end_to_end']['median_ms']:.1f} ms end to end")
+    for size, api in results['api'].items():
+        print(f"{size} listings: {api['full_warm']['requests_per_s']:.0f} req/s full, "
+              f"{api['filtered']['requests_per_s']:.0f} req/s filtered")
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+"""Monthly carrying cost of every listing across mortgage scenarios.
+
+Listings are loaded once from the store's typed columns into NumPy arrays
+(ListingArrays).  A ScenarioGrid is the Cartesian product of mortgage
+rates, down payments and amortization periods.  The monthly cost of listing
+i under scenario j is
+
+    price[i] * (1 - down[j]) * payment_factor[j] + taxes_municipal[i] + taxes_school[i] + condo_fee[i]
+
+(taxes and fees are stored monthly), so the whole listings x scenarios grid
+is an outer product plus a broadcast add, computed in blocks to bound
+memory.  Rates compound semi-annually like Canadian fixed-rate mortgages;
+mortgage insurance is not included.
+
+    python carrying_costs.py --rates 3:7:0.25 --down 0.05,0.1,0.2 --years 20,25,30 --budget 4000
+"""
+import argparse
+import json
+import math
+import threading
+import time
+
+import numpy as np
+
+from listing_store import SeqWatcher, get_store
+
+MONTHLY_COLUMNS = ['taxes_municipal', 'taxes_school', 'condo_fee']
+# Largest scenario grid computed per API request, and by the command line
+MAX_SCENARIOS = 1000
+MAX_CLI_SCENARIOS = 100_000
+DEFAULT_PERCENTILES = (10, 50, 90)
+# Cells per block of the cost grid (float32: 4 bytes each)
+BLOCK_CELLS = 8_000_000
+
+
+def parse_values(spec, max_values=MAX_SCENARIOS):
+    """Parse "3,4.5,6" or an inclusive range "start:stop:step" into a sorted list of floats.
+
+    Raises ValueError for values that are not finite numbers, and for more
+    than max_values values, before building them.
+    """
+    try:
+        if ':' in spec:
+            start, stop, step = (float(part) for part in spec.split(':'))
+            if not all(math.isfinite(value) for value in (start, stop, step)):
+                raise ValueError
+            if not step > 0 or not stop >= start:
+                raise ValueError
+            # The small epsilon keeps stop itself when (stop - start) / step is a float like 3.9999999
+            count = math.floor((stop - start) / step + 1e-9) + 1
+        else:
+            parts = [part for part in spec.split(',') if part.strip()]
+            count = len(parts)
+    except (ValueError, OverflowError):
+        raise ValueError(f"Invalid value list: {spec!r} (use 3,4,5 or start:stop:step)")
+    if not count:
+        raise ValueError(f"Invalid value list: {spec!r}")
+    if count > max_values:
+        raise ValueError(f"Too many values in {spec!r}: {count} (at most {max_values})")
+    try:
+        if ':' in spec:
+            values = [round(start + i * step, 6) for i in range(count)]
+        else:
+            values = [float(part) for part in parts]
+            if not all(math.isfinite(value) for value in values):
+                raise ValueError
+    except ValueError:
+        raise ValueError(f"Invalid value list: {spec!r} (use 3,4,5 or start:stop:step)")
+    return sorted(set(values))
+
+
+def check_grid_size(rates, down_payments, years, max_scenarios=MAX_SCENARIOS):
+    """Raise ValueError if the grid of these values would exceed max_scenarios."""
+    size = len(rates) * len(down_payments) * len(years)
+    if size > max_scenarios:
+        raise ValueError(f"{size} scenarios requested, at most {max_scenarios} are allowed")
+
+
+class ScenarioGrid:
+    """Every combination of annual rate (%), down payment (fraction) and amortization (years)."""
+
+    def __init__(self, rates, down_payments, years, max_scenarios=MAX_SCENARIOS):
+        check_grid_size(rates, down_payments, years, max_scenarios)
+        rate, down, years = np.meshgrid(np.asarray(rates, dtype=np.float64),
+                                        np.asarray(down_payments, dtype=np.float64),
+                                        np.asarray(years, dtype=np.float64), indexing='ij')
+        self.rate = rate.ravel()
+        self.down = down.ravel()
+        self.years = years.ravel()
+        if (self.down < 0).any() or (self.down >= 1).any():
+            raise ValueError("Down payments must be fractions between 0 and 1")
+        if (self.years <= 0).any() or (self.rate < 0).any():
+            raise ValueError("Rates must be >= 0 and amortization periods > 0")
+
+        # Semi-annual compounding: (1 + r/2)^2 = (1 + i)^12
+        monthly_rate = (1 + self.rate / 200) ** (1 / 6) - 1
+        payments = self.years * 12
+        with np.errstate(divide='ignore', invalid='ignore'):
+            factor = monthly_rate / (1 - (1 + monthly_rate) ** -payments)
+        self.payment_factor = np.where(monthly_rate > 0, factor, 1 / payments)
+        # Monthly mortgage payment per dollar of price
+        self.price_factor = (1 - self.down) * self.payment_factor
+
+    def __len__(self):
+        return len(self.rate)
+
+    def describe(self, index):
+        return {'rate': round(float(self.rate[index]), 6), 'down_payment': round(float(self.down[index]), 6),
+                'years': int(self.years[index])}
+
+
+class ListingArrays:
+    """Prices and monthly fixed costs of the listings as parallel NumPy arrays."""
+
+    def __init__(self, ids, price, monthly_fixed, complete):
+        self.ids = ids
+        self.price = price
+        self.monthly_fixed = monthly_fixed
+        # False where a tax or the condo fee is missing (counted as 0)
+        self.complete = complete
+        self.positions = {centris_id: i for i, centris_id in enumerate(ids)}
+
+    @classmethod
+    def from_store(cls, store):
+        rows = store.column_values(['price'] + MONTHLY_COLUMNS)
+        if not rows:
+            empty = np.empty(0, dtype=np.float64)
+            return cls([], empty, empty, np.empty(0, dtype=bool))
+        columns = list(zip(*rows))
+        monthly = np.array(columns[2:], dtype=np.float64)
+        return cls(list(columns[0]), np.array(columns[1], dtype=np.float64),
+                   np.nansum(monthly, axis=0), ~np.isnan(monthly).any(axis=0))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def subset(self, ids):
+        """Return the listings with the given ids (unknown ids are skipped)."""
+        index = np.array([self.positions[i] for i in ids if i in self.positions], dtype=np.intp)
+        return ListingArrays([self.ids[i] for i in index], self.price[index], self.monthly_fixed[index],
+                             self.complete[index])
+
+
+def monthly_costs(listings, grid, start=0, stop=None, dtype=np.float32):
+    """Return the (listings x scenarios[start:stop]) matrix of monthly carrying costs."""
+    price_factor = grid.price_factor[start:stop].astype(dtype)
+    costs = np.multiply.outer(listings.price.astype(dtype), price_factor)
+    costs += listings.monthly_fixed.astype(dtype)[:, None]
+    return costs
+
+
+def scenario_summary(listings, grid, budget=None, percentiles=DEFAULT_PERCENTILES):
+    """Per-scenario statistics of the monthly cost over all listings.
+
+    Returns a list of dicts (one per scenario) with the mean, the given
+    percentiles and, with a budget, how many listings fit in it.
+    """
+    summary = [grid.describe(j) for j in range(len(grid))]
+    count = len(listings)
+    if not count:
+        return summary
+    price = listings.price.astype(np.float32)
+    fixed = listings.monthly_fixed.astype(np.float32)
+    # Percentiles by linear interpolation between the two nearest ranks
+    positions = [(count - 1) * p / 100 for p in percentiles]
+    ranks = [(math.floor(pos), math.ceil(pos), pos - math.floor(pos)) for pos in positions]
+
+    block = max(1, BLOCK_CELLS // count)
+    for start in range(0, len(grid), block):
+        # One row per scenario, so each sort runs over contiguous memory
+        costs = np.multiply.outer(grid.price_factor[start:start + block].astype(np.float32), price)
+        costs += fixed
+        means = costs.mean(axis=1, dtype=np.float64)
+        affordable = (costs <= budget).sum(axis=1) if budget is not None else None
+        costs.sort(axis=1)
+        for offset in range(costs.shape[0]):
+            entry = summary[start + offset]
+            entry['mean'] = round(float(means[offset]), 2)
+            row = costs[offset]
+            for p, (low, high, fraction) in zip(percentiles, ranks):
+                value = float(row[low]) + (float(row[high]) - float(row[low])) * fraction
+                entry[f'p{p:g}'] = round(value, 2)
+            if affordable is not None:
+                entry['affordable'] = int(affordable[offset])
+    return summary
+
+
+def listing_costs(listings, grid):
+    """Return, per listing, its monthly cost under every scenario."""
+    costs = monthly_costs(listings, grid, dtype=np.float64).round(2)
+    return [{'centris_id': centris_id, 'price': float(price), 'monthly_fixed': round(float(fixed), 2),
+             'complete': bool(complete), 'monthly_costs': row.tolist()}
+            for centris_id, price, fixed, complete, row
+            in zip(listings.ids, listings.price, listings.monthly_fixed, listings.complete, costs)]
+
+
+class CarryingCosts:
+    """ListingArrays of the store, reloaded when the store has been written to."""
+
+    def __init__(self, store=None, check_interval=1.0):
+        self.watcher = SeqWatcher(store, check_interval)
+        self.lock = threading.Lock()
+        self.listings = None
+
+    def arrays(self):
+        """Return the current ListingArrays."""
+        with self.lock:
+            changed = self.watcher.changed(force=self.listings is None)
+            if changed or self.listings is None:
+                self.listings = ListingArrays.from_store(self.watcher.get_store())
+            return self.listings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monthly carrying costs of every listing across mortgage scenarios.")
+    parser.add_argument('--rates', default='5', help="annual rates in %%, e.g. 4,5,6 or 3:7:0.25")
+    parser.add_argument('--down', default='0.2', help="down payments as fractions, e.g. 0.05,0.1,0.2")
+    parser.add_argument('--years', default='25', help="amortization periods in years, e.g. 20,25,30")
+    parser.add_argument('--budget', type=float, help="monthly budget; counts the listings within it")
+    parser.add_argument('--listing', action='append', default=[], help="show every scenario for this Centris ID")
+    parser.add_argument('--max-scenarios', type=int, default=MAX_CLI_SCENARIOS,
+                        help=f"refuse grids larger than this (default {MAX_CLI_SCENARIOS})")
+    parser.add_argument('--output', help="save the full cost grid (float32) with ids and scenarios to this .npz file")
+    args = parser.parse_args(argv)
+
+    try:
+        grid = ScenarioGrid(parse_values(args.rates, args.max_scenarios), parse_values(args.down, args.max_scenarios),
+                            parse_values(args.years, args.max_scenarios), max_scenarios=args.max_scenarios)
+    except ValueError as e:
+        parser.error(str(e))
+    start = time.perf_counter()
+    listings = ListingArrays.from_store(get_store())
+    load_s = time.perf_counter() - start
+
+    if args.listing:
+        for entry in listing_costs(listings.subset(args.listing), grid):
+            print(json.dumps(entry))
+        return
+
+    start = time.perf_counter()
+    summary = scenario_summary(listings, grid, budget=args.budget)
+    summary_s = time.perf_counter() - start
+    for entry in summary:
+        print(json.dumps(entry))
+    print(f"{len(listings)} listings x {len(grid)} scenarios: loaded in {load_s:.2f}s, summarized in {summary_s:.2f}s")
+
+    if args.output:
+        np.savez(args.output, ids=np.array(listings.ids), costs=monthly_costs(listings, grid),
+                 rate=grid.rate, down_payment=grid.down, years=grid.years)
+        print(f"Cost grid written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Columnar chart payloads for /api/chart-data.
+
+A payload holds the chart data points as parallel arrays, one per column:
+
+    {"count": 2, "downsampled": false, "y": null, "encoding": "json",
+     "columns": {"centris_id": ["111", "112"], "price": [399000, 410000], ...}}
+
+With encoding=binary the numeric columns are base64 strings of
+little-endian int32 values (MISSING for null), which browsers decode with
+an Int32Array.
+
+When there are more points than max_points, the points are binned on a
+grid of price x the y column and each non-empty cell keeps its first
+listing, with the number of listings in the cell in the "n" column.  A
+full payload serves every y column; a downsampled one only the one it was
+binned on.
+"""
+import array
+import base64
+import math
+import sys
+
+CHART_COLUMNS = ['centris_id', 'price', 'assessment', 'sqft', 'price_per_sqft', 'address', 'thumb_path']
+NUMERIC_COLUMNS = ['price', 'assessment', 'sqft', 'price_per_sqft', 'n']
+Y_COLUMNS = ['assessment', 'price_per_sqft']
+ENCODINGS = ['json', 'binary']
+MAX_CHART_POINTS = 50000
+# int32 stand-in for null in binary columns
+MISSING = -2 ** 31
+
+
+def encode_int32(values):
+    """Return the values as base64 of little-endian int32, with MISSING for None."""
+    data = array.array('i', [MISSING if value is None else value for value in values])
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return base64.b64encode(data.tobytes()).decode('ascii')
+
+
+def downsample(points, y, max_points):
+    """Keep one point per cell of a price x y grid of at most max_points cells.
+
+    Points without a y value are dropped.  Returns (points, counts) where
+    counts[i] is the number of points in the cell of points[i].
+    """
+    points = [point for point in points if point[y] is not None]
+    if len(points) <= max_points:
+        return points, [1] * len(points)
+
+    side = max(1, math.isqrt(max_points))
+    x_min = min(point['price'] for point in points)
+    y_min = min(point[y] for point in points)
+    x_scale = side / ((max(point['price'] for point in points) - x_min) or 1)
+    y_scale = side / ((max(point[y] for point in points) - y_min) or 1)
+
+    cells = {}
+    for point in points:
+        cell = (min(int((point['price'] - x_min) * x_scale), side - 1),
+                min(int((point[y] - y_min) * y_scale), side - 1))
+        kept = cells.get(cell)
+        if kept is None:
+            cells[cell] = [point, 1]
+        else:
+            kept[1] += 1
+    return [kept[0] for kept in cells.values()], [kept[1] for kept in cells.values()]
+
+
+def chart_payload(points, y=None, max_points=None, encoding='json'):
+    """Build the columnar payload for a list of chart data points.
+
+    The points are downsampled on y only when there are more than max_points.
+    """
+    count = len(points)
+    downsampled = max_points is not None and count > max_points
+    counts = None
+    if downsampled:
+        points, counts = downsample(points, y, max_points)
+
+    columns = {name: [point[name] for point in points] for name in CHART_COLUMNS}
+    if counts is not None:
+        columns['n'] = counts
+    if encoding == 'binary':
+        for name in NUMERIC_COLUMNS:
+            if name in columns:
+                columns[name] = encode_int32(columns[name])
+    return {
+        'count': count,
+        'downsampled': downsampled,
+        'y': y if downsampled else None,
+        'encoding': encoding,
+        'columns': columns,
+    }
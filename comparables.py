@@ -0,0 +1,281 @@
+"""Comparable listings by nearest-neighbour search.
+
+Each listing becomes a point of normalized features (sqft, bedrooms, year of
+construction, condo fee).  Points live in a KD-tree that is kept in sync
+with the store by write sequence, like ListingIndex: new and updated
+listings are inserted, their previous points are marked deleted, and the
+tree is rebuilt (re-normalizing the features) once enough has changed.
+
+The distance between two listings is the Euclidean distance between their
+points plus BUILDING_PENALTY when they are not in the same building (the
+address without its unit), so units of the same building rank first among
+equally similar listings.
+"""
+import bisect
+import logging
+import math
+import re
+import statistics
+import threading
+
+from listing_record import ListingRecord
+from listing_store import SeqWatcher
+from metrics import log_event, stage
+
+FEATURES = ['sqft', 'bedrooms', 'year_of_construction', 'condo_fee']
+BUILDING_PENALTY = 0.5
+# Rebuild once this fraction of the tree has been inserted or deleted since the last build
+REBUILD_FRACTION = 0.25
+
+UNIT_RE = re.compile(r',\s*(?:app\.|appartement)\s*\d+.*$', re.IGNORECASE)
+SUMMARY_FIELDS = ['address', 'price', 'sqft', 'bedrooms', 'bathrooms', 'year_of_construction', 'condo_fee']
+
+
+def building_key(address):
+    """Return the building part of an address ("1700, Rue X, app. 12" -> "1700, rue x"), or None."""
+    if not address:
+        return None
+    return ' '.join(UNIT_RE.sub('', address).lower().split()) or None
+
+
+def to_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def summary(record):
+    """Return the SUMMARY_FIELDS of a ListingRecord as a dict."""
+    return {field: getattr(record, field) for field in SUMMARY_FIELDS}
+
+
+def listing_features(record):
+    """Return the raw feature values of a record (None where missing), or None if it has none."""
+    values = [to_number(record.get(feature)) for feature in FEATURES]
+    return values if any(value is not None for value in values) else None
+
+
+class KDTree:
+    """KD-tree over fixed-length tuples supporting insertion, deletion and k-nearest search.
+
+    Each node is a list [point, key, left, right, alive, left_max, right_min]
+    where left_max and right_min are the largest coordinate in the left
+    subtree and the smallest in the right one along the node's split axis
+    (its depth modulo the dimension).  Pruning on those instead of on the
+    node's own coordinate skips the gaps of discrete features like bedrooms.
+    """
+
+    def __init__(self, items=(), dims=len(FEATURES)):
+        self.dims = dims
+        self.root = self._build(list(items), 0)
+
+    def _build(self, items, depth):
+        if not items:
+            return None
+        axis = depth % self.dims
+        items.sort(key=lambda item: item[0][axis])
+        middle = len(items) // 2
+        left_max = items[middle - 1][0][axis] if middle else -math.inf
+        right_min = items[middle + 1][0][axis] if middle + 1 < len(items) else math.inf
+        return [items[middle][0], items[middle][1],
+                self._build(items[:middle], depth + 1), self._build(items[middle + 1:], depth + 1), True,
+                left_max, right_min]
+
+    def insert(self, point, key):
+        """Insert a point and return its node (pass it to delete())."""
+        node = [point, key, None, None, True, -math.inf, math.inf]
+        if self.root is None:
+            self.root = node
+            return node
+        current, depth = self.root, 0
+        while True:
+            axis = depth % self.dims
+            value = point[axis]
+            if value < current[0][axis]:
+                current[5] = max(current[5], value)
+                branch = 2
+            else:
+                current[6] = min(current[6], value)
+                branch = 3
+            if current[branch] is None:
+                current[branch] = node
+                return node
+            current, depth = current[branch], depth + 1
+
+    @staticmethod
+    def delete(node):
+        node[4] = False
+
+    def nearest(self, point, k, skip=()):
+        """Return [(squared distance, key)] of the k nearest live points not in skip, closest first."""
+        best = []  # sorted [(squared distance, key)], at most k
+        worst = math.inf
+        dims = self.dims
+        dist = math.dist
+        # (node, depth, per-axis distance from point to the subtree's bounds,
+        #  sum of their squares: a lower bound of the distance to the subtree)
+        stack = [(self.root, 0, (0.0,) * dims, 0.0)] if self.root is not None else []
+        while stack:
+            node, depth, offsets, bound = stack.pop()
+            if bound >= worst:
+                continue
+            node_point = node[0]
+            if node[4] and node[1] not in skip:
+                d2 = dist(node_point, point) ** 2
+                if d2 < worst:
+                    bisect.insort(best, (d2, node[1]))
+                    if len(best) > k:
+                        best.pop()
+                    if len(best) == k:
+                        worst = best[-1][0]
+
+            axis = depth % dims
+            value = point[axis]
+            old = offsets[axis]
+            # Offsets of the left and right subtrees along the split axis
+            left_offset = value - node[5]
+            right_offset = node[6] - value
+            left = right = None
+            if node[2] is not None:
+                if left_offset <= old:
+                    left = (node[2], depth + 1, offsets, bound)
+                else:
+                    left_bound = bound - old * old + left_offset * left_offset
+                    if left_bound < worst:
+                        left = (node[2], depth + 1, offsets[:axis] + (left_offset,) + offsets[axis + 1:], left_bound)
+            if node[3] is not None:
+                if right_offset <= old:
+                    right = (node[3], depth + 1, offsets, bound)
+                else:
+                    right_bound = bound - old * old + right_offset * right_offset
+                    if right_bound < worst:
+                        right = (node[3], depth + 1, offsets[:axis] + (right_offset,) + offsets[axis + 1:], right_bound)
+            # Push the farther side first so the nearer one is searched first
+            if left is not None and right is not None and left[3] < right[3]:
+                left, right = right, left
+            if left is not None:
+                stack.append(left)
+            if right is not None:
+                stack.append(right)
+        return best
+
+
+class ComparablesIndex:
+    """Nearest-neighbour index of the listings in the store, kept in sync by write sequence."""
+
+    def __init__(self, store=None, check_interval=1.0):
+        self.watcher = SeqWatcher(store, check_interval)
+        self.lock = threading.Lock()
+        # centris_id -> (raw features, building key, ListingRecord)
+        self.listings = {}
+        # centris_id -> tree node of its current point
+        self.nodes = {}
+        # building key -> centris_ids of the units in that building
+        self.buildings = {}
+        self.center = [0.0] * len(FEATURES)
+        self.scale = [1.0] * len(FEATURES)
+        self.tree = KDTree()
+        self.changes_since_build = 0
+
+    def refresh(self, force=False):
+        """Index listings written since the last refresh; return True if the index changed."""
+        with self.lock:
+            rows = self.watcher.poll(force)
+            if rows is None:
+                return False
+            with stage('comparables_load'):
+                self._load_changes(rows)
+            return True
+
+    def _load_changes(self, rows):
+        # Called with the lock held
+        inserted = {}
+        for _, record in rows:
+            centris_id = record.get('centris_id', '')
+            try:
+                features = listing_features(record)
+            except Exception as e:
+                log_event('comparables_record_failed', logging.WARNING, centris_id=centris_id, error=str(e))
+                features = None
+
+            node = self.nodes.pop(centris_id, None)
+            if node is not None:
+                KDTree.delete(node)
+                self.changes_since_build += 1
+            previous = self.listings.pop(centris_id, None)
+            if previous is not None and previous[1]:
+                self.buildings[previous[1]].discard(centris_id)
+            if features is None:
+                inserted.pop(centris_id, None)
+                continue
+            building = building_key(record.get('address'))
+            self.listings[centris_id] = (features, building, ListingRecord.from_dict(record))
+            if building:
+                self.buildings.setdefault(building, set()).add(centris_id)
+            inserted[centris_id] = features
+            self.changes_since_build += 1
+
+        # Large batches (such as the first load) rebuild a balanced tree
+        # instead of growing the current one
+        if self.changes_since_build > REBUILD_FRACTION * max(len(self.listings), 1):
+            self._rebuild()
+        else:
+            for centris_id, features in inserted.items():
+                self.nodes[centris_id] = self.tree.insert(self._normalize(features), centris_id)
+
+    def _rebuild(self):
+        # Re-derive the normalization from the current listings and rebalance the tree
+        for i in range(len(FEATURES)):
+            values = [features[i] for features, _, _ in self.listings.values() if features[i] is not None]
+            self.center[i] = statistics.median(values) if values else 0.0
+            spread = statistics.pstdev(values) if len(values) > 1 else 0.0
+            self.scale[i] = spread or 1.0
+        items = [(self._normalize(features), centris_id) for centris_id, (features, _, _) in self.listings.items()]
+        self.tree = KDTree(items)
+        self.nodes = {}
+        self.buildings = {k: v for k, v in self.buildings.items() if v}
+        self._index_nodes(self.tree.root)
+        self.changes_since_build = 0
+
+    def _index_nodes(self, root):
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if node is not None:
+                self.nodes[node[1]] = node
+                stack.extend((node[2], node[3]))
+
+    def _normalize(self, features):
+        # Missing values sit at the center, i.e. they neither help nor hurt similarity
+        return tuple(0.0 if value is None else (value - center) / scale
+                     for value, center, scale in zip(features, self.center, self.scale))
+
+    def comparables(self, centris_id, n=10):
+        """Return the n listings most similar to centris_id, or None if it is not indexed."""
+        self.refresh()
+        with self.lock:
+            listing = self.listings.get(centris_id)
+            if listing is None:
+                return None
+            features, building, _ = listing
+            point = self._normalize(features)
+
+            # The building penalty is the same for every other building, so
+            # the n nearest points of the tree outside the listing's building,
+            # plus the units of that building, contain the n best comparables
+            same_building = self.buildings.get(building, set()) if building else set()
+            skip = same_building | {centris_id}
+            candidates = {key: d2 for d2, key in self.tree.nearest(point, n, skip)}
+            for key in same_building:
+                candidates[key] = math.dist(point, self._normalize(self.listings[key][0])) ** 2
+            candidates.pop(centris_id, None)
+
+            scored = []
+            for key, d2 in candidates.items():
+                same = key in same_building
+                scored.append((math.sqrt(d2) + (0 if same else BUILDING_PENALTY), key, same))
+            scored.sort()
+            return [dict(summary(self.listings[key][2]), centris_id=key, distance=round(distance, 4),
+                         same_building=same)
+                    for distance, key, same in scored[:n]]
@@ -1,20 +1,41 @@
 import requests
-from bs4 import BeautifulSoup
+from atomic_io import listing_lock
+from html_archive import archive_page, diff_fields
+from listing_pipeline import HEADERS, REQUEST_TIMEOUT, Page, extractor, fetch
+from listing_record import INTEGER_FIELDS, normalize_record, to_int
+from listing_cache import ListingCache, SingleFlight
+from listing_feed import LISTING_FEED
+from listing_store import get_store
+from metrics import CACHE_LOOKUPS, SINGLE_FLIGHT_SHARED, log_event, stage
+from photos import PHOTO_POOL, save_photo
 import re
 import pprint
 import argparse
-import sys
-import os
-import json
-from datetime import datetime
-import shutil
+import logging
+import time
+from datetime import datetime, timedelta
 
 
+# Cached listings older than this are revalidated with a conditional request
+CACHE_TTL = timedelta(days=7)
+
+# Recently used listings, in front of the listing store
+LISTING_CACHE = ListingCache(capacity=1024)
+# Concurrent loads of the same listing share one cache lookup or fetch
+LOADS = SingleFlight()
+
 def build_centris_url(centris_id: str) -> str:
     """Build the full Centris URL from an ID number."""
     return f"https://www.centris.ca/fr/condo~a-vendre~montreal-ville-marie/{centris_id}"
 
 
+# Compiled patterns shared by the helpers below.
+WHITESPACE_RE = re.compile(r"\s+")
+NUMBER_RE = re.compile(r'([\d\s.,]+)')
+THOUSANDS_SEP_RE = re.compile(r"[\s,]")
+PHOTO_SRC_RE = re.compile(r'https://mspublic\.centris\.ca/media\.ashx.*[?&]t=pi\b')
+
+
 def normalize_text(text: str) -> str:
     """Normalize extracted text: strip, remove NBSP and excessive whitespace/newlines.
 
@@ -25,9 +46,8 @@ def normalize_text(text: str) -> str:
     # Replace NBSP with regular space, convert multiple whitespace to single space,
     # and strip leading/trailing whitespace/newlines.
     s = text.replace("\xa0", " ")
-    s = s.replace("\u00A0", " ")
     # Normalize all whitespace (newlines, tabs) to single spaces
-    s = re.sub(r"\s+", " ", s)
+    s = WHITESPACE_RE.sub(" ", s)
     return s.strip()
 
 
@@ -36,11 +56,11 @@ def extract_number(text: str):
     if not text:
         return None
     s = normalize_text(text)
-    match = re.search(r'([\d\s.,]+)', s)
+    match = NUMBER_RE.search(s)
     if match:
         num = match.group(1)
         # Remove spaces and commas used as thousands separators
-        return re.sub(r"[\s,]", "", num)
+        return THOUSANDS_SEP_RE.sub("", num)
     return None
 
 def get_centris_id_from_url(url):
@@ -50,258 +70,402 @@ def get_centris_id_from_url(url):
 
 def get_cached_data(centris_id):
     """Try to get cached data for a Centris ID."""
-    cache_file = os.path.join('data', f'{centris_id}.json')
-    if os.path.exists(cache_file):
-        with open(cache_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return None
+    with stage('cache_read'):
+        data = LISTING_CACHE.get(centris_id)
+    CACHE_LOOKUPS.inc(result='hit' if data else 'miss')
+    return data
 
-def download_primary_photo(centris_id, soup, headers):
-    """Download the primary photo from the listing."""
+def find_primary_photo_url(soup):
+    """Return the URL of the listing's primary photo, or None."""
+    # Look for images from Centris media server with specific format
+    photo = soup.find('img', src=PHOTO_SRC_RE)
+    photo_url = photo.get('src') if photo else None
+    if photo_url and photo_url.startswith('//'):
+        photo_url = 'https:' + photo_url
+    return photo_url or None
+
+def download_primary_photo(centris_id, photo_url, headers=HEADERS, session=None):
+    """Download the primary photo into the photo store and record its paths on the listing.
+
+    Runs on the background photo pool; uses the given requests session (for
+    connection reuse) when provided.
+    """
+    http = session or requests
     try:
-        # Look for images from Centris media server with specific format
-        photo = soup.find('img', src=re.compile(r'https://mspublic\.centris\.ca/media\.ashx.*[?&]t=pi\b'))
-            
-        if photo:
-            photo_url = photo.get('src')
-            if photo_url:
-                if photo_url.startswith('//'):
-                    photo_url = 'https:' + photo_url
-                
-                # Download the photo
-                photo_response = requests.get(photo_url, headers=headers, stream=True)
-                photo_response.raise_for_status()
-                
-                # Save the photo
-                photo_path = os.path.join('data', f'{centris_id}.jpeg')
-                with open(photo_path, 'wb') as f:
-                    shutil.copyfileobj(photo_response.raw, f)
-                
-                return photo_url
+        with stage('photo_download'):
+            photo_response = http.get(photo_url, headers=headers, timeout=REQUEST_TIMEOUT)
+            photo_response.raise_for_status()
+            fields = save_photo(photo_response.content, centris_id=centris_id)
+        with stage('cache_write'):
+            get_store().update(centris_id, fields)
+        LISTING_CACHE.invalidate(centris_id)
+        LISTING_FEED.notify()
+        return fields
     except Exception as e:
-        print(f"Failed to download photo: {str(e)}")
+        log_event('photo_download_failed', logging.WARNING, centris_id=centris_id, photo_url=photo_url, error=str(e))
     return None
 
 def save_to_cache(centris_id, data):
-    """Save extracted data to cache file."""
-    os.makedirs('data', exist_ok=True)
-    cache_file = os.path.join('data', f'{centris_id}.json')
-    with open(cache_file, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    """Save extracted data to the listing store."""
+    with stage('cache_write'):
+        seq = get_store().save(centris_id, data)
+    LISTING_CACHE.put(centris_id, data, seq)
+    LISTING_FEED.notify()
 
-def extract_listing_data(url):
-    # Extract Centris ID from URL
-    centris_id = get_centris_id_from_url(url)
-    if not centris_id:
-        raise ValueError("Invalid Centris URL")
-    
-    # Check cache first
-    cached_data = get_cached_data(centris_id)
-    if cached_data:
-        return cached_data
-    
-    # If not in cache, fetch from web
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                      "AppleWebKit/537.36 (KHTML, like Gecko) "
-                      "Chrome/120.0 Safari/537.36"
-    }
-    resp = requests.get(url, headers=headers)
-    resp.raise_for_status()
-    soup = BeautifulSoup(resp.text, "html.parser")
-
-    data = {}
-
-    # Address - try multiple approaches
-    address = None
-    
-    # First try h2 with app. pattern
+
+# Address like "1234, Rue Example, app. 567"
+ADDRESS_RE = re.compile(r'(\d+,\s*(?:Rue|Avenue|Boulevard|Boul\.|Ave\.|Chemin|Ch\.|Place|Pl\.)[^,]+(?:,\s*(?:app\.|appartement)\s*\d+)?)', re.IGNORECASE)
+ADDRESS_HINT_RE = re.compile(r'\d+,\s*(?:Rue|Avenue|Boulevard|Boul\.|Ave\.|Chemin|Ch\.|Place|Pl\.)', re.IGNORECASE)
+CARACTERISTIQUES_RE = re.compile("Caractéristiques")
+
+SQFT_SECTION_PATTERNS = [
+    re.compile(r"Superficie (?:habitable|nette|brute)\s*(?::|de)?\s*(\d[\d\s,]+)\s*(?:pc|pi)", re.IGNORECASE),
+    re.compile(r"(\d[\d\s,]+)\s*(?:pc|pi)", re.IGNORECASE),
+    re.compile(r"Superficie.*?(\d[\d\s,]+)\s*(?:pc|pi)", re.IGNORECASE),
+]
+SQFT_PAGE_PATTERNS = [
+    re.compile(r"Superficie (?:habitable|nette|brute)\s*(?::|de)?\s*(\d[\d\s,]+)\s*(?:pc|pi)", re.IGNORECASE),
+    re.compile(r"(\d[\d\s,]+)\s*(?:pc|pi)\b", re.IGNORECASE),
+]
+YEAR_RE = re.compile(r"Année\s+(?:de\s+)?construction\s*(?::|de)?\s*(\d{4})", re.IGNORECASE)
+
+# Element fields: (field, css class); the first element with that class holds the value.
+ELEMENT_FIELD_SPECS = [
+    ("price", "price"),
+    ("bedrooms", "cac"),
+    ("bathrooms", "sdb"),
+]
+
+# Text fields, evaluated against the flattened "Caractéristiques" section
+# ("section") and the flattened page ("page").  Each spec lists its
+# (scope, pattern) sources in priority order; the first source that yields
+# a value wins.  "first" takes the first match of a pattern, "largest" takes
+# the largest number among all its matches.  Specs are evaluated in order,
+# so derived fields can rely on the fields before them.
+TEXT_FIELD_SPECS = [
+    {
+        "field": "sqft",
+        "mode": "first",
+        "sources": [("section", p) for p in SQFT_SECTION_PATTERNS]
+                   + [("page", p) for p in SQFT_PAGE_PATTERNS],
+        "clean": lambda value: THOUSANDS_SEP_RE.sub("", value),
+    },
+    {
+        "field": "year_of_construction",
+        "mode": "first",
+        "sources": [("section", YEAR_RE), ("page", YEAR_RE)],
+    },
+    {
+        "field": "municipal_terrain",
+        "mode": "largest",
+        "sources": [("page", re.compile(r"Terrain\s*:?\s*(\d[\d\s,]+)\s*\$", re.IGNORECASE))],
+    },
+    {
+        "field": "municipal_building",
+        "mode": "largest",
+        "sources": [("page", re.compile(r"Bâtiment\s*:?\s*(\d[\d\s,]+)\s*\$", re.IGNORECASE))],
+    },
+    {
+        "field": "municipal_assessment_total",
+        "mode": "largest",
+        "sources": [("page", re.compile(r"(?:Total|Évaluation municipale totale)\s*:?\s*(\d[\d\s,]+)\s*\$", re.IGNORECASE))],
+    },
+    {
+        # Prefer the amount with the year in parentheses (the annual amount)
+        "field": "taxes_municipal",
+        "mode": "largest",
+        "sources": [("page", re.compile(r"[Mm]unicipales\s*\(\d{4}\)\s*:?\s*(\d[\d\s,]+)\s*\$")),
+                    ("page", re.compile(r"[Mm]unicipales\s*:?\s*(\d[\d\s,]+)\s*\$"))],
+        "monthly": True,
+    },
+    {
+        "field": "taxes_school",
+        "mode": "largest",
+        "sources": [("page", re.compile(r"[Ss]colaires\s*\(\d{4}\)\s*:?\s*(\d[\d\s,]+)\s*\$")),
+                    ("page", re.compile(r"[Ss]colaires\s*:?\s*(\d[\d\s,]+)\s*\$"))],
+        "monthly": True,
+    },
+    {
+        "field": "condo_fee",
+        "mode": "largest",
+        "sources": [("page", re.compile(r"Frais de copropriété\s*:?\s*(\d[\d\s,]+)\s*\$"))],
+        "monthly": True,
+    },
+]
+
+# Order of the extracted fields in the output record
+LISTING_FIELDS = [
+    "address", "price", "bedrooms", "bathrooms", "sqft", "year_of_construction",
+    "municipal_assessment_total", "municipal_terrain", "municipal_building",
+    "taxes_municipal", "taxes_school", "condo_fee",
+]
+
+
+def get_largest_number(matches):
+    """Return the largest number (as a digits-only string) among regex matches, or None."""
+    values = []
+    for m in matches:
+        value = extract_number(m.group(1))
+        if value:
+            values.append(value)
+    return max(values, key=int) if values else None
+
+
+def extract_address(soup):
+    """Find the listing address in headings, meta tags, then any text node."""
+    # First try h1/h2 with app. pattern
     for heading in soup.find_all(['h1', 'h2']):
-        text = normalize_text(heading.get_text())
-        # Look for pattern like "1234, Rue Example, app. 567"
-        match = re.search(r'(\d+,\s*(?:Rue|Avenue|Boulevard|Boul\.|Ave\.|Chemin|Ch\.|Place|Pl\.)[^,]+(?:,\s*(?:app\.|appartement)\s*\d+)?)', text, re.IGNORECASE)
+        match = ADDRESS_RE.search(normalize_text(heading.get_text()))
         if match:
-            address = match.group(1)
-            break
-    
+            return match.group(1)
+
     # If not found, try meta tags
-    if not address:
-        for meta in soup.find_all('meta', {'property': ['og:title', 'description']}):
-            text = normalize_text(meta.get('content', ''))
-            match = re.search(r'(\d+,\s*(?:Rue|Avenue|Boulevard|Boul\.|Ave\.|Chemin|Ch\.|Place|Pl\.)[^,]+(?:,\s*(?:app\.|appartement)\s*\d+)?)', text, re.IGNORECASE)
-            if match:
-                address = match.group(1)
-                break
-    
+    for meta in soup.find_all('meta', {'property': ['og:title', 'description']}):
+        match = ADDRESS_RE.search(normalize_text(meta.get('content', '')))
+        if match:
+            return match.group(1)
+
     # Last try: look for address in any tag with specific structure
-    if not address:
-        address_text = soup.find(string=re.compile(r'\d+,\s*(?:Rue|Avenue|Boulevard|Boul\.|Ave\.|Chemin|Ch\.|Place|Pl\.)', re.IGNORECASE))
-        if address_text:
-            match = re.search(r'(\d+,\s*(?:Rue|Avenue|Boulevard|Boul\.|Ave\.|Chemin|Ch\.|Place|Pl\.)[^,]+(?:,\s*(?:app\.|appartement)\s*\d+)?)', normalize_text(address_text), re.IGNORECASE)
-            if match:
-                address = match.group(1)
-    
-    data["address"] = address
-
-    # Price
-    price = soup.find(class_="price")
-    if price:
-        data["price"] = extract_number(price.get_text())
-    else:
-        data["price"] = None
-
-    # Bedrooms
-    bedrooms = soup.find(class_="cac")
-    data["bedrooms"] = extract_number(bedrooms.get_text()) if bedrooms else None
-
-    # Bathrooms
-    bathrooms = soup.find(class_="sdb")
-    data["bathrooms"] = extract_number(bathrooms.get_text()) if bathrooms else None
-
-    # Square footage - try multiple patterns
-    sqft = None
-    # First try finding in Caractéristiques section
-    caractéristiques = soup.find(string=re.compile("Caractéristiques"))
-    if caractéristiques:
-        section = caractéristiques.find_parent()
-        if section:
-            # Look for various superficie patterns in this section
-            patterns = [
-                r"Superficie (?:habitable|nette|brute)\s*(?::|de)?\s*(\d[\d\s,]+)\s*(?:pc|pi)",
-                r"(\d[\d\s,]+)\s*(?:pc|pi)",
-                r"Superficie.*?(\d[\d\s,]+)\s*(?:pc|pi)"
-            ]
-            section_text = normalize_text(section.get_text())
-            for pattern in patterns:
-                m = re.search(pattern, section_text, flags=re.IGNORECASE)
-                if m:
-                    sqft = re.sub(r"[\s,]", "", m.group(1))
-                    break
-    
-    # If not found, try searching whole page
-    if not sqft:
-        full_text = normalize_text(soup.get_text())
-        patterns = [
-            r"Superficie (?:habitable|nette|brute)\s*(?::|de)?\s*(\d[\d\s,]+)\s*(?:pc|pi)",
-            r"(\d[\d\s,]+)\s*(?:pc|pi)\b"
-        ]
-        for pattern in patterns:
-            m = re.search(pattern, full_text, flags=re.IGNORECASE)
-            if m:
-                sqft = re.sub(r"[\s,]", "", m.group(1))
-                break
-    
-    data["sqft"] = sqft
-
-    # Year of construction
-    year = None
-    # Try finding in Caractéristiques section first
-    caractéristiques = soup.find(string=re.compile("Caractéristiques"))
-    if caractéristiques:
-        section = caractéristiques.find_parent()
-        if section:
-            section_text = normalize_text(section.get_text())
-            m = re.search(r"Année\s+(?:de\s+)?construction\s*(?::|de)?\s*(\d{4})", section_text, flags=re.IGNORECASE)
+    address_text = soup.find(string=ADDRESS_HINT_RE)
+    if address_text:
+        match = ADDRESS_RE.search(normalize_text(address_text))
+        if match:
+            return match.group(1)
+    return None
+
+
+def extract_field(spec, texts):
+    """Evaluate one text field spec against the flattened texts ({scope: text})."""
+    value = None
+    for scope, pattern in spec["sources"]:
+        text = texts.get(scope)
+        if not text:
+            continue
+        if spec["mode"] == "largest":
+            value = get_largest_number(pattern.finditer(text))
+        else:
+            m = pattern.search(text)
             if m:
-                year = m.group(1)
-    
-    # If not found, search whole page
-    if not year:
-        full_text = normalize_text(soup.get_text())
-        m = re.search(r"Année\s+(?:de\s+)?construction\s*(?::|de)?\s*(\d{4})", full_text, flags=re.IGNORECASE)
-        if m:
-            year = m.group(1)
-    
-    data["year_of_construction"] = year
-
-    # Financial information extraction (assessments, taxes, fees)
-    assess_total = None
-    assess_terrain = None
-    assess_building = None
-    tax_municipal = None
-    tax_school = None
-    condo_fee = None
-    
-    # Get full page text once
-    full_text = normalize_text(soup.get_text())
-    
-    # Helper function to find largest number in a list of matches
-    def get_largest_number(matches):
-        values = [extract_number(m.group(1)) for m in matches if extract_number(m.group(1))]
-        return max(values, key=lambda x: int(x)) if values else None
-    
-    # Municipal assessments
-    # Try finding Terrain value (look for number after "Terrain")
-    terrain_matches = re.finditer(r"Terrain\s*:?\s*(\d[\d\s,]+)\s*\$", full_text, flags=re.IGNORECASE)
-    assess_terrain = get_largest_number(terrain_matches)
-    
-    # Try finding Bâtiment value
-    building_matches = re.finditer(r"Bâtiment\s*:?\s*(\d[\d\s,]+)\s*\$", full_text, flags=re.IGNORECASE)
-    assess_building = get_largest_number(building_matches)
-    
-    # Try finding total value directly
-    total_matches = re.finditer(r"(?:Total|Évaluation municipale totale)\s*:?\s*(\d[\d\s,]+)\s*\$", full_text, flags=re.IGNORECASE)
-    assess_total = get_largest_number(total_matches)
-    
+                value = m.group(1)
+                clean = spec.get("clean")
+                if clean:
+                    value = clean(value)
+        if value:
+            break
+    return value
+
+
+def extract_text_fields(texts):
+    """Run TEXT_FIELD_SPECS over the flattened texts ({scope: text}) in one sweep."""
+    data = {spec["field"]: extract_field(spec, texts) for spec in TEXT_FIELD_SPECS}
+
     # If we have terrain and building but no total, calculate it
-    if not assess_total and assess_terrain and assess_building:
-        assess_total = str(int(assess_terrain) + int(assess_building))
-    
-    # Taxes
-    # Look for municipal taxes with year in parentheses (to get annual amount)
-    mun_matches = re.finditer(r"[Mm]unicipales\s*\(\d{4}\)\s*:?\s*(\d[\d\s,]+)\s*\$", full_text)
-    tax_municipal = get_largest_number(mun_matches)
-    
-    # If not found, try without year
-    if not tax_municipal:
-        mun_matches = re.finditer(r"[Mm]unicipales\s*:?\s*(\d[\d\s,]+)\s*\$", full_text)
-        tax_municipal = get_largest_number(mun_matches)
-    
-    # Same for school taxes
-    school_matches = re.finditer(r"[Ss]colaires\s*\(\d{4}\)\s*:?\s*(\d[\d\s,]+)\s*\$", full_text)
-    tax_school = get_largest_number(school_matches)
-    
-    if not tax_school:
-        school_matches = re.finditer(r"[Ss]colaires\s*:?\s*(\d[\d\s,]+)\s*\$", full_text)
-        tax_school = get_largest_number(school_matches)
-    
-    # Condo fees - look for annual amount
-    fee_matches = re.finditer(r"Frais de copropriété\s*:?\s*(\d[\d\s,]+)\s*\$", full_text)
-    condo_fee = get_largest_number(fee_matches)
-    
+    terrain, building = to_int(data["municipal_terrain"]), to_int(data["municipal_building"])
+    if not data["municipal_assessment_total"] and terrain and building:
+        data["municipal_assessment_total"] = terrain + building
+
     # Convert annual values to monthly for taxes and fees
-    if tax_municipal:
-        tax_municipal = str(round(int(tax_municipal) / 12))
-    if tax_school:
-        tax_school = str(round(int(tax_school) / 12))
-    if condo_fee:
-        condo_fee = str(round(int(condo_fee) / 12))
-    
-    # Store results
-    data["municipal_assessment_total"] = assess_total
-    data["municipal_terrain"] = assess_terrain
-    data["municipal_building"] = assess_building
-    data["taxes_municipal"] = tax_municipal  # Now monthly
-    data["taxes_school"] = tax_school  # Now monthly
-    data["condo_fee"] = condo_fee  # Now monthly
-
-    # Download primary photo
-    photo_url = download_primary_photo(centris_id, soup, headers)
-    
-    # Add metadata to the data
+    for spec in TEXT_FIELD_SPECS:
+        value = data[spec["field"]]
+        if spec.get("monthly") and value:
+            data[spec["field"]] = round(to_int(value) / 12)
+    return data
+
+
+def flatten_texts(soup):
+    """Return the normalized text of the page and of its "Caractéristiques" section."""
+    with stage('normalize'):
+        texts = {"page": normalize_text(soup.get_text())}
+        caracteristiques = soup.find(string=CARACTERISTIQUES_RE)
+        section = caracteristiques.find_parent() if caracteristiques else None
+        if section:
+            texts["section"] = normalize_text(section.get_text())
+    return texts
+
+
+def page_texts(page):
+    """Flattened texts of a pipeline Page, computed once and shared by its extractors."""
+    return page.memo("texts", lambda page: flatten_texts(page.soup))
+
+
+def parse_listing_fields(soup, texts=None):
+    """Extract the listing fields from a parsed page.
+
+    The page and the "Caractéristiques" section are each flattened and
+    normalized once (or taken from texts), then every field spec runs
+    against those texts.
+    """
+    if texts is None:
+        texts = flatten_texts(soup)
+
+    with stage('extract_fields'):
+        data = {"address": extract_address(soup)}
+        for field, css_class in ELEMENT_FIELD_SPECS:
+            element = soup.find(class_=css_class)
+            data[field] = extract_number(element.get_text()) if element else None
+        data.update(extract_text_fields(texts))
+
+    # Numbers are typed here so they compare equal to stored records
+    return {field: to_int(data[field]) if field in INTEGER_FIELDS else data[field] for field in LISTING_FIELDS}
+
+
+@extractor("listing")
+def listing_extractor(page):
+    return parse_listing_fields(page.soup, page_texts(page))
+
+
+@extractor("photo_url")
+def photo_url_extractor(page):
+    return find_primary_photo_url(page.soup)
+
+
+def is_stale(data, max_age=CACHE_TTL):
+    """Return True if a cached record was last checked against the site more than max_age ago."""
+    checked = data.get("last_checked") or data.get("extraction_date")
+    if not checked:
+        return True
+    try:
+        return datetime.now() - datetime.fromisoformat(checked) > max_age
+    except ValueError:
+        return True
+
+
+def load_listing(url, centris_id, session=None, max_age=CACHE_TTL):
+    """Return (record, from_cache) for a listing, revalidating stale cache entries.
+
+    A stale record is refreshed with a conditional request; if the page is
+    unchanged (304) the cached record is kept.  When revalidation fails the
+    stale record is served rather than an error.  Concurrent calls for the
+    same listing share one cache lookup and at most one fetch.
+    """
+    result, shared = LOADS.do(centris_id, _load_listing, url, centris_id, session, max_age)
+    if shared:
+        SINGLE_FLIGHT_SHARED.inc()
+    return result
+
+
+def _load_listing(url, centris_id, session, max_age):
+    cached_data = get_cached_data(centris_id)
+    if cached_data and not is_stale(cached_data, max_age):
+        log_event('extract', centris_id=centris_id, cache='hit')
+        return cached_data, True
+
+    # Another process may be fetching the same listing; wait for it and
+    # re-read the store, which may now hold a fresh record
+    with listing_lock(centris_id):
+        with stage('cache_read'):
+            cached_data = LISTING_CACHE.load(centris_id)
+        if cached_data and not is_stale(cached_data, max_age):
+            log_event('extract', centris_id=centris_id, cache='hit')
+            return cached_data, True
+
+        if not cached_data:
+            return fetch_listing_data(url, centris_id, session=session), False
+
+        try:
+            data = fetch_listing_data(url, centris_id, session=session, previous=cached_data)
+        except Exception as e:
+            log_event('revalidate_failed', logging.WARNING, centris_id=centris_id, error=str(e))
+            return cached_data, True
+        if data is None:
+            # Not modified: only record when we last checked
+            data = dict(cached_data, last_checked=datetime.now().isoformat())
+            save_to_cache(centris_id, data)
+            log_event('extract', centris_id=centris_id, cache='revalidated')
+            return data, True
+        return data, False
+
+
+def extract_listing_data(url, session=None):
+    """Return the listing record for a Centris URL, from cache or from the web.
+
+    Pass a requests session to reuse pooled connections across listings.
+    """
+    # Extract Centris ID from URL
+    centris_id = get_centris_id_from_url(url)
+    if not centris_id:
+        raise ValueError("Invalid Centris URL")
+
+    data, _ = load_listing(url, centris_id, session=session)
+    return data
+
+
+def fetch_listing_data(url, centris_id, session=None, previous=None):
+    """Fetch and parse a listing page, save the record and queue its photo download.
+
+    With a previous record the request is conditional on its ETag and
+    Last-Modified values, and None is returned if the page has not changed.
+    Fields that changed since the previous record are appended to the
+    listing's history.
+    """
+    start = time.perf_counter()
+
+    headers = HEADERS
+    if previous:
+        headers = dict(HEADERS)
+        if previous.get("http_etag"):
+            headers["If-None-Match"] = previous["http_etag"]
+        if previous.get("http_last_modified"):
+            headers["If-Modified-Since"] = previous["http_last_modified"]
+    resp = fetch(url, session, headers)
+    if previous and resp.status_code == 304:
+        return None
+    # Keep the raw page so the record can be re-extracted offline
+    with stage('archive'):
+        page_archive = archive_page(resp.text)
+
+    page = Page(url, resp.text)
+    data = listing_extractor(page)
+    photo_url = photo_url_extractor(page)
+
+    # Add metadata to the data; the photo paths are filled in once the
+    # background download has stored it
+    now = datetime.now().isoformat()
     data["url"] = url
     data["centris_id"] = centris_id
-    data["extraction_date"] = datetime.now().isoformat()
+    data["extraction_date"] = now
+    data["last_checked"] = now
     data["photo_url"] = photo_url
-    data["photo_path"] = f'{centris_id}.jpeg' if photo_url else None
-    
-    # Save to cache
-    save_to_cache(centris_id, data)
-    
+    data["photo_path"] = None
+    data["photo_thumbnails"] = None
+    data["page_archive"] = page_archive
+    data["http_etag"] = resp.headers.get("ETag")
+    data["http_last_modified"] = resp.headers.get("Last-Modified")
+
+    # Same photo as before: keep the stored files instead of downloading again
+    download_photo = bool(photo_url)
+    if previous and photo_url and previous.get("photo_url") == photo_url and previous.get("photo_path"):
+        data["photo_path"] = previous["photo_path"]
+        data["photo_thumbnails"] = previous.get("photo_thumbnails")
+        download_photo = False
+    data = normalize_record(data)
+
+    # Save to cache, with the dated delta of any changed fields
+    changes = diff_fields(previous, {field: data[field] for field in LISTING_FIELDS}) if previous else None
+    if changes:
+        with stage('cache_write'):
+            seq = get_store().save_with_changes(centris_id, data, changes, now)
+        LISTING_CACHE.put(centris_id, data, seq)
+        LISTING_FEED.notify()
+        log_event('listing_changed', centris_id=centris_id, changes=changes)
+    else:
+        save_to_cache(centris_id, data)
+
+    # Download primary photo off the critical path
+    if download_photo:
+        PHOTO_POOL.submit(download_primary_photo, centris_id, photo_url, HEADERS, session)
+
+    log_event('extract', centris_id=centris_id, cache='miss',
+              duration_ms=round((time.perf_counter() - start) * 1000, 1))
     return data
 
 
 if __name__ == "__main__":
-    url = "https://www.centris.ca/fr/condo~a-vendre~montreal-ville-marie/16819211"
-    info = extract_listing_data(url)
-    pprint.pprint(info)
+    # For many listings at once use batch_extract.py
+    parser = argparse.ArgumentParser(description="Extract Centris listing data.")
+    parser.add_argument("listings", nargs="*", default=["16819211"], help="Centris IDs or listing URLs")
+    args = parser.parse_args()
+    for entry in args.listings:
+        url = build_centris_url(entry) if entry.isdigit() else entry
+        info = extract_listing_data(url)
+        pprint.pprint(info)
@@ -0,0 +1,234 @@
+"""Discover listings by crawling Centris search result pages.
+
+Starting from one or more search result URLs, the crawler follows the
+pages' "next" links, collects the listing links on each page and feeds the
+ones worth fetching to extraction, on a bounded thread pool sharing one
+rate-limited session (see batch_extract).
+
+The crawl frontier (the crawl_frontier table, next to the listings) keeps
+every listing seen with its first and last sighting and a signature of its
+search result card (price, address, ...) as of its last extraction, so a
+repeated crawl only extracts:
+
+- new listings, not in the frontier nor in the store;
+- changed listings, whose card signature differs.  They are revalidated
+  even if their cached record is still fresh.
+
+Listings already in the store when first seen are recorded as they are,
+without a fetch.  A listing is looked at once per crawl, even when it shows
+up on several result pages.  Its signature is recorded when it is first
+seen and updated only by a successful extraction, so a failed extraction
+is retried on the next crawl: as new until the listing has been extracted
+once, as changed after that.
+
+    python crawler.py 'https://www.centris.ca/fr/condo~a-vendre~montreal-ville-marie' --max-pages 20
+"""
+import argparse
+import hashlib
+import logging
+import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from urllib.parse import urljoin
+
+from batch_extract import BatchSession
+from condo_extractor import CACHE_TTL, load_listing
+from listing_pipeline import fetch_page
+from listing_store import get_store
+from metrics import CRAWL_LISTINGS, log_event
+
+# Listing links: /fr/<type>~a-vendre~<area>/<centris id>
+LISTING_LINK_RE = re.compile(r'/fr/[^/?#]+~a-vendre~[^/?#]+/(\d+)(?:[?#]|$)')
+NEXT_CLASS_RE = re.compile(r'\bnext\b', re.IGNORECASE)
+# How far up from a listing link to look for its result card
+CARD_DEPTH = 4
+
+FRONTIER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS crawl_frontier (
+    centris_id TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    signature TEXT,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL,
+    last_extracted TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_crawl_frontier_last_seen ON crawl_frontier (last_seen);
+"""
+
+
+def card_signature(link):
+    """Hash the text of the search result card around a listing link."""
+    card = link
+    # The card is the closest ancestor showing a price
+    for _ in range(CARD_DEPTH):
+        if '$' in card.get_text() or card.parent is None:
+            break
+        card = card.parent
+    text = ' '.join(card.get_text(' ').split())
+    return hashlib.md5(text.encode('utf-8')).hexdigest()
+
+
+def parse_results(page):
+    """Return [(centris_id, url, signature)] for the listings linked from a result page."""
+    results = {}
+    for link in page.soup.find_all('a', href=True):
+        match = LISTING_LINK_RE.search(link['href'])
+        if match and match.group(1) not in results:
+            url = urljoin(page.url, link['href']).split('#')[0]
+            results[match.group(1)] = (match.group(1), url, card_signature(link))
+    return list(results.values())
+
+
+def next_page_url(page):
+    """Return the URL of the next result page, or None on the last one."""
+    link = page.soup.find('a', rel='next', href=True)
+    if link is None:
+        link = page.soup.find('a', class_=NEXT_CLASS_RE, href=True)
+    if link is None:
+        item = page.soup.find('li', class_=NEXT_CLASS_RE)
+        link = item.find('a', href=True) if item else None
+    return urljoin(page.url, link['href']) if link else None
+
+
+def iter_result_pages(start_urls, session=None, max_pages=50):
+    """Yield the result pages reachable from start_urls by next links, at most max_pages."""
+    seen = set()
+    for url in start_urls:
+        while url and url not in seen and len(seen) < max_pages:
+            seen.add(url)
+            try:
+                page = fetch_page(url, session)
+            except Exception as e:
+                log_event('crawl_page_failed', logging.WARNING, url=url, error=str(e))
+                break
+            yield page
+            url = next_page_url(page)
+
+
+def extract_listing(url, centris_id, session, revalidate):
+    """Load a listing, from the web when revalidate is True; raise if it could not be checked."""
+    started = datetime.now().isoformat()
+    record, _ = load_listing(url, centris_id, session, max_age=timedelta(0) if revalidate else CACHE_TTL)
+    # load_listing serves the cached record when revalidation fails
+    if revalidate and (record.get('last_checked') or record.get('extraction_date') or '') < started:
+        raise RuntimeError("Could not revalidate the listing; kept the cached record")
+    return record
+
+
+class CrawlFrontier:
+    """Listings seen while crawling, stored next to the listings in the store's database."""
+
+    def __init__(self, store=None):
+        self.store = store or get_store()
+        self.store.connect().executescript(FRONTIER_SCHEMA)
+
+    def observe(self, results, seen_at):
+        """Record the listings found on a result page.
+
+        Returns [(centris_id, url, signature, outcome)] with outcome one of
+        new, changed, unchanged or known (already in the store when first seen).
+        """
+        if not results:
+            return []
+        conn = self.store.connect()
+        ids = [centris_id for centris_id, _, _ in results]
+        rows = {row['centris_id']: row for row in conn.execute(
+            f"SELECT centris_id, signature, last_extracted FROM crawl_frontier "
+            f"WHERE centris_id IN ({', '.join('?' for _ in ids)})",
+            ids)}
+        known = self.store.known_ids(ids)
+
+        observed = []
+        with conn:
+            for centris_id, url, signature in results:
+                row = rows.get(centris_id)
+                if row is None:
+                    outcome = 'known' if centris_id in known else 'new'
+                    conn.execute(
+                        'INSERT INTO crawl_frontier (centris_id, url, signature, first_seen, last_seen) '
+                        'VALUES (?, ?, ?, ?, ?)',
+                        (centris_id, url, signature, seen_at, seen_at))
+                else:
+                    if row['last_extracted'] is None and centris_id not in known:
+                        # Seen before but never extracted: its extraction failed
+                        outcome = 'new'
+                    else:
+                        outcome = 'unchanged' if row['signature'] == signature else 'changed'
+                    conn.execute('UPDATE crawl_frontier SET url = ?, last_seen = ? WHERE centris_id = ?',
+                                 (url, seen_at, centris_id))
+                observed.append((centris_id, url, signature, outcome))
+        return observed
+
+    def mark_extracted(self, centris_id, signature, extracted_at):
+        conn = self.store.connect()
+        with conn:
+            conn.execute('UPDATE crawl_frontier SET signature = ?, last_extracted = ? WHERE centris_id = ?',
+                         (signature, extracted_at, centris_id))
+
+    def count(self):
+        return self.store.connect().execute('SELECT COUNT(*) FROM crawl_frontier').fetchone()[0]
+
+
+def crawl(start_urls, concurrency=4, rate=2.0, retries=3, backoff=0.5, max_pages=50, store=None):
+    """Crawl result pages and extract new and changed listings; return a summary of counts."""
+    frontier = CrawlFrontier(store)
+    summary = {'pages': 0, 'new': 0, 'changed': 0, 'unchanged': 0, 'known': 0, 'ok': 0, 'failed': 0}
+    in_flight = {}
+    # Listings already looked at in this crawl, from earlier result pages
+    seen = set()
+
+    def finish(done):
+        for future in done:
+            centris_id, signature = in_flight.pop(future)
+            try:
+                future.result()
+            except Exception as e:
+                summary['failed'] += 1
+                print(f"Failed to extract {centris_id}: {str(e)}")
+                continue
+            summary['ok'] += 1
+            frontier.mark_extracted(centris_id, signature, datetime.now().isoformat())
+
+    with BatchSession(pool_size=concurrency, rate=rate, retries=retries, backoff=backoff) as session:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for page in iter_result_pages(start_urls, session, max_pages):
+                summary['pages'] += 1
+                results = [result for result in parse_results(page) if result[0] not in seen]
+                seen.update(centris_id for centris_id, _, _ in results)
+                observed = frontier.observe(results, datetime.now().isoformat())
+                for centris_id, url, signature, outcome in observed:
+                    summary[outcome] += 1
+                    CRAWL_LISTINGS.inc(result=outcome)
+                    if outcome not in ('new', 'changed'):
+                        continue
+                    # A changed card means the page changed, so a fresh cached record is not enough
+                    future = pool.submit(extract_listing, url, centris_id, session, outcome == 'changed')
+                    in_flight[future] = (centris_id, signature)
+                    # Keep result pages from running far ahead of extraction
+                    while len(in_flight) >= 2 * concurrency:
+                        finish(wait(in_flight, return_when=FIRST_COMPLETED).done)
+                log_event('crawl_page', url=page.url, listings=len(observed))
+            finish(wait(in_flight).done)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Crawl Centris search results and extract new or changed listings.")
+    parser.add_argument('start_urls', nargs='+', help="search result page URLs")
+    parser.add_argument('--max-pages', type=int, default=50, help="result pages to fetch at most")
+    parser.add_argument('--concurrency', type=int, default=4, help="number of listings fetched at once")
+    parser.add_argument('--rate', type=float, default=2.0, help="max requests per second per host (0 = unlimited)")
+    parser.add_argument('--retries', type=int, default=3, help="retries for failed or throttled requests")
+    parser.add_argument('--backoff', type=float, default=0.5, help="initial retry delay in seconds, doubled each retry")
+    args = parser.parse_args(argv)
+
+    summary = crawl(args.start_urls, concurrency=args.concurrency, rate=args.rate, retries=args.retries,
+                    backoff=args.backoff, max_pages=args.max_pages)
+    print(f"Crawled {summary['pages']} pages: {summary['new']} new, {summary['changed']} changed, "
+          f"{summary['unchanged']} unchanged, {summary['known']} already stored; "
+          f"extracted {summary['ok']}, failed {summary['failed']}")
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,144 @@
+"""Background extraction jobs.
+
+Listings are extracted by a bounded thread pool instead of inside the web
+request.  Submitting a URL returns a job right away; clients follow it by
+polling get() or by reading the server-sent events from stream_events().
+A submission for a centris_id that already has a job in flight joins that
+job instead of fetching the page again.
+"""
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from batch_extract import BatchSession
+from condo_extractor import get_centris_id_from_url, load_listing
+from metrics import log_event
+
+FINISHED = ('done', 'failed')
+
+
+class QueueFullError(RuntimeError):
+    """Raised when too many jobs are already waiting or running."""
+
+
+class ExtractionJobs:
+    """Queue of extraction jobs run by a bounded worker pool."""
+
+    def __init__(self, max_workers=4, max_pending=100, keep_finished=1000, rate=2.0):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='extract')
+        self.session = BatchSession(pool_size=max_workers, rate=rate)
+        self.max_pending = max_pending
+        self.keep_finished = keep_finished
+        self.jobs = OrderedDict()
+        # centris_id -> id of its queued or running job
+        self.in_flight = {}
+        # Bumped and notified on every job change, for stream_events
+        self.changed = threading.Condition()
+        self.version = 0
+
+    def submit(self, url):
+        """Queue an extraction for url and return the job (an existing one if in flight)."""
+        centris_id = get_centris_id_from_url(url)
+        if not centris_id:
+            raise ValueError("Invalid Centris URL")
+
+        with self.changed:
+            job_id = self.in_flight.get(centris_id)
+            if job_id:
+                return dict(self.jobs[job_id])
+            if len(self.in_flight) >= self.max_pending:
+                raise QueueFullError("Too many extraction jobs in progress, try again later")
+            job = {
+                'job_id': uuid.uuid4().hex,
+                'url': url,
+                'centris_id': centris_id,
+                'status': 'queued',
+                'submitted': time.time(),
+                'data': None,
+                'fromCache': None,
+                'error': None,
+            }
+            self.jobs[job['job_id']] = job
+            self.in_flight[centris_id] = job['job_id']
+            self._prune()
+            self._notify()
+            snapshot = dict(job)
+
+        self.executor.submit(self._run, job['job_id'], url, centris_id)
+        return snapshot
+
+    def get(self, job_id):
+        """Return a copy of a job, or None if it is unknown or expired."""
+        with self.changed:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def wait(self, job_id, timeout=None):
+        """Block until a job finishes (or timeout) and return it."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.changed:
+            while True:
+                job = self.jobs.get(job_id)
+                if job is None or job['status'] in FINISHED:
+                    return dict(job) if job else None
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return dict(job)
+                self.changed.wait(remaining)
+
+    def stream_events(self, job_ids, heartbeat=15):
+        """Yield server-sent events for each status change of the given jobs.
+
+        Each change is a 'job' event carrying the job as JSON.  The stream
+        ends with an 'end' event once every job has finished or expired.
+        """
+        sent = {}
+        while True:
+            with self.changed:
+                version = self.version
+                jobs = {job_id: dict(self.jobs[job_id]) for job_id in job_ids if job_id in self.jobs}
+
+            for job_id, job in jobs.items():
+                if sent.get(job_id) != job['status']:
+                    sent[job_id] = job['status']
+                    yield f"event: job\ndata: {json.dumps(job, ensure_ascii=False)}\n\n"
+
+            if all(job['status'] in FINISHED for job in jobs.values()):
+                yield "event: end\ndata: {}\n\n"
+                return
+
+            with self.changed:
+                if not self.changed.wait_for(lambda: self.version != version, heartbeat):
+                    # Comment line to keep proxies from closing an idle stream
+                    yield ": keepalive\n\n"
+
+    def _run(self, job_id, url, centris_id):
+        self._update(job_id, status='running')
+        try:
+            data, from_cache = load_listing(url, centris_id, session=self.session)
+            self._update(job_id, status='done', data=data, fromCache=from_cache)
+        except Exception as e:
+            log_event('extract_failed', logging.WARNING, centris_id=centris_id, url=url, error=str(e))
+            self._update(job_id, status='failed', error=str(e))
+
+    def _update(self, job_id, **changes):
+        with self.changed:
+            job = self.jobs[job_id]
+            job.update(changes)
+            if job['status'] in FINISHED:
+                self.in_flight.pop(job['centris_id'], None)
+            self._notify()
+
+    def _notify(self):
+        self.version += 1
+        self.changed.notify_all()
+
+    def _prune(self):
+        # Forget the oldest finished jobs beyond keep_finished
+        finished = [job_id for job_id, job in self.jobs.items() if job['status'] in FINISHED]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self.jobs[job_id]
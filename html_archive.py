@@ -0,0 +1,118 @@
+"""Compressed, content-addressed archive of fetched listing pages.
+
+extract_listing_data stores every page it fetches here and records the
+archive key on the listing (`page_archive`), so records can be rebuilt
+when the extraction rules change without fetching anything again:
+
+    python html_archive.py reextract [--workers N] [--dry-run]
+
+re-parses every archived page across a process pool and reports which
+fields changed for each listing.  Listings whose archived page is missing
+or unreadable are skipped and reported.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from atomic_io import atomic_write
+from listing_store import get_store
+from metrics import log_event
+
+ARCHIVE_DIR = os.path.join('data', 'archive')
+
+
+def archive_path(key, archive_dir=ARCHIVE_DIR):
+    # Two-level fan-out keeps directories small
+    return os.path.join(archive_dir, key[:2], f'{key}.html.gz')
+
+
+def archive_page(html, archive_dir=ARCHIVE_DIR):
+    """Store a page gzip-compressed under the hash of its content and return the key."""
+    content = html.encode('utf-8')
+    key = hashlib.sha256(content).hexdigest()
+    path = archive_path(key, archive_dir)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        atomic_write(path, gzip.compress(content, compresslevel=6))
+    return key
+
+
+def load_page(key, archive_dir=ARCHIVE_DIR):
+    """Return the archived page for a key."""
+    with gzip.open(archive_path(key, archive_dir), 'rb') as f:
+        return f.read().decode('utf-8')
+
+
+def reparse_page(key, archive_dir=ARCHIVE_DIR):
+    """Re-run field extraction on an archived page (process pool worker)."""
+    from condo_extractor import parse_listing_fields
+    from html_parser import make_soup
+
+    return parse_listing_fields(make_soup(load_page(key, archive_dir)))
+
+
+def try_reparse_page(key, archive_dir=ARCHIVE_DIR):
+    """Like reparse_page, but return (fields, None) or (None, error message) instead of raising."""
+    try:
+        return reparse_page(key, archive_dir), None
+    except Exception as e:
+        return None, f'{type(e).__name__}: {e}'
+
+
+def diff_fields(old, new):
+    """Return {field: [old, new]} for every field whose value changed."""
+    return {field: [old.get(field), value] for field, value in new.items() if old.get(field) != value}
+
+
+def reextract(store, workers=None, dry_run=False, archive_dir=ARCHIVE_DIR):
+    """Re-parse every archived listing and save the changed records.
+
+    Returns (changes, skipped): {centris_id: {field: [old, new]}} for the
+    listings that changed and {centris_id: error} for those whose archived
+    page could not be read or parsed.
+    """
+    records = [record for _, record in store.changed_since(0) if record.get('page_archive')]
+    changes = {}
+    skipped = {}
+    updated = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        keys = [record['page_archive'] for record in records]
+        results = pool.map(try_reparse_page, keys, [archive_dir] * len(keys), chunksize=16)
+        for record, (fields, error) in zip(records, results):
+            if error is not None:
+                skipped[record['centris_id']] = error
+                log_event('reextract_skipped', logging.WARNING, centris_id=record['centris_id'],
+                          page_archive=record['page_archive'], error=error)
+                continue
+            changed = diff_fields(record, fields)
+            if changed:
+                changes[record['centris_id']] = changed
+                updated.append((record['centris_id'], dict(record, **fields)))
+    if updated and not dry_run:
+        store.save_many(updated)
+    return changes, skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archived listing pages.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    reextract_parser = subparsers.add_parser('reextract', help="re-parse every archived page offline")
+    reextract_parser.add_argument('--workers', type=int, help="number of parser processes (default: CPU count)")
+    reextract_parser.add_argument('--dry-run', action='store_true', help="report changes without saving them")
+    args = parser.parse_args(argv)
+
+    changes, skipped = reextract(get_store(), workers=args.workers, dry_run=args.dry_run)
+    for centris_id, changed in sorted(changes.items()):
+        print(json.dumps({'centris_id': centris_id, 'changes': changed}, ensure_ascii=False))
+    for centris_id, error in sorted(skipped.items()):
+        print(f"Skipped {centris_id}: {error}")
+    print(f"{len(changes)} listings changed" + (" (not saved)" if args.dry_run else "")
+          + (f", {len(skipped)} skipped" if skipped else ""))
+
+
+if __name__ == '__main__':
+    main()
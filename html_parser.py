@@ -0,0 +1,44 @@
+"""HTML parser backend selection for the scrapers.
+
+Every scraper builds its tree through make_soup() so they all share one
+backend.  The C-backed lxml tree builder is used when lxml is installed and
+html.parser otherwise; both are driven through BeautifulSoup, so the
+find/find_all/get_text calls in the scrapers work unchanged.  Set the
+HTML_PARSER environment variable to force a backend.
+"""
+import os
+
+from bs4 import BeautifulSoup, FeatureNotFound
+
+FALLBACK_PARSER = "html.parser"
+# Fastest first
+PREFERRED_PARSERS = ["lxml", FALLBACK_PARSER]
+
+
+def parser_available(parser):
+    """Return True if BeautifulSoup can build trees with the given parser."""
+    try:
+        BeautifulSoup("", parser)
+    except FeatureNotFound:
+        return False
+    return True
+
+
+def detect_parser():
+    """Pick the parser backend: HTML_PARSER if set and usable, else the fastest available."""
+    requested = os.environ.get("HTML_PARSER")
+    if requested and parser_available(requested):
+        return requested
+    for parser in PREFERRED_PARSERS:
+        if parser_available(parser):
+            return parser
+    return FALLBACK_PARSER
+
+
+PARSER = detect_parser()
+
+
+def make_soup(html, parser=None):
+    """Parse an HTML document with the selected backend."""
+    return BeautifulSoup(html, parser or PARSER)
+
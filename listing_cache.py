@@ -0,0 +1,142 @@
+"""In-process listing cache and single-flight loading.
+
+ListingCache is a bounded LRU of parsed listing records kept in front of
+the listing store, so repeated lookups of a listing skip SQLite and JSON
+decoding.  Records are held as ListingRecord objects and every lookup gets
+its own dict, so callers may modify what they get.  Writes made through this process update it directly; writes
+from elsewhere (another worker, a batch run, reextract) are noticed the
+same way ListingIndex notices them: the store's write sequence is checked
+at most once per check interval and the listings written since are evicted.
+
+Each cached record carries the write sequence it is current as of, so the
+check leaves alone the records this process wrote itself, and a record
+read before a check that already went past it is not cached at all.
+
+SingleFlight lets concurrent callers for the same key share one call:
+the first caller runs it and the others wait for its result.
+"""
+import threading
+from collections import OrderedDict
+
+from listing_record import ListingRecord
+from listing_store import SeqWatcher
+from metrics import MEMORY_CACHE_LOOKUPS
+
+
+class ListingCache:
+    """Bounded LRU of listing records by centris_id, read through to the store."""
+
+    def __init__(self, store=None, capacity=1024, check_interval=1.0):
+        # Nothing is cached at first, so nothing written before can be stale
+        self.watcher = SeqWatcher(store, check_interval, seq=None)
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        self.records = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, centris_id):
+        """Return the record for centris_id from memory or the store, or None."""
+        self._sync()
+        with self.lock:
+            entry = self.records.get(centris_id)
+            if entry is not None:
+                self.records.move_to_end(centris_id)
+                self.hits += 1
+        if entry is not None:
+            MEMORY_CACHE_LOOKUPS.inc(result='hit')
+            return entry[0].to_dict()
+
+        MEMORY_CACHE_LOOKUPS.inc(result='miss')
+        with self.lock:
+            self.misses += 1
+        return self.load(centris_id)
+
+    def load(self, centris_id):
+        """Read the record for centris_id from the store, bypassing memory, and remember it."""
+        if self.watcher.seq is None:
+            self._sync()
+        # The record is at least as recent as the writes the cache has seen
+        seq = self.watcher.seq
+        record = self.watcher.get_store().get(centris_id)
+        if record is not None:
+            self.put(centris_id, record, seq)
+        return record
+
+    def put(self, centris_id, record, seq):
+        """Remember the record for centris_id, current as of store write seq.
+
+        Skipped once the cache has checked the store past seq: a later write
+        of the listing may already have been seen, and would not evict it.
+        """
+        if self.watcher.seq is None:
+            self._sync()
+        with self.lock:
+            if seq < self.watcher.seq:
+                return
+            self.records[centris_id] = (ListingRecord.from_dict(record), seq)
+            self.records.move_to_end(centris_id)
+            while len(self.records) > self.capacity:
+                self.records.popitem(last=False)
+
+    def invalidate(self, centris_id):
+        with self.lock:
+            self.records.pop(centris_id, None)
+
+    def stats(self):
+        """Return hit/miss counts and the current size."""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else None,
+                'size': len(self.records),
+                'capacity': self.capacity,
+            }
+
+    def _sync(self):
+        # Evict listings written since the last check, except by this process's own writes
+        changed = self.watcher.poll_ids()
+        if changed:
+            with self.lock:
+                for seq, centris_id in changed:
+                    entry = self.records.get(centris_id)
+                    if entry is not None and entry[1] < seq:
+                        del self.records[centris_id]
+
+
+class SingleFlight:
+    """Run at most one call per key at a time; concurrent callers share its result."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        """Call fn(*args, **kwargs), or wait for the call already in flight for key.
+
+        Returns (result, shared) where shared is True for callers that waited
+        on another caller's call.  Its exception is raised in every caller.
+        """
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = {'done': threading.Event(), 'result': None, 'error': None}
+
+        if not leader:
+            call['done'].wait()
+        else:
+            try:
+                call['result'] = fn(*args, **kwargs)
+            except BaseException as e:
+                call['error'] = e
+            finally:
+                with self.lock:
+                    del self.calls[key]
+                call['done'].set()
+
+        if call['error'] is not None:
+            raise call['error']
+        return call['result'], not leader
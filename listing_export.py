@@ -0,0 +1,169 @@
+"""Bulk export of the listings as CSV, JSON Lines or Parquet.
+
+Rows are read lazily from the store and written in chunks of CHUNK_ROWS,
+so memory stays flat whatever the number of listings.  Each row has the
+record's fields plus the derived total assessment and price per sqft.
+Filters, sort and fields are the /api/property-data ones (see
+listing_query), fields naming EXPORT_COLUMNS.  Without filters every
+listing is exported, including those without a price.
+
+Parquet needs pyarrow (pip install pyarrow).
+
+    python listing_export.py --format csv --output listings.csv --min-price 500000
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+
+try:
+    import pyarrow
+    import pyarrow.parquet as parquet
+except ImportError:
+    pyarrow = None
+
+from listing_index import derived_fields
+from listing_query import parse_listing_query
+from listing_record import INTEGER_FIELDS
+from listing_store import RANGE_EXPRESSIONS, get_store
+
+EXPORT_COLUMNS = (['centris_id', 'address', 'url', 'price', 'assessment', 'price_per_sqft']
+                  + [field for field in INTEGER_FIELDS if field != 'price']
+                  + ['extraction_date', 'last_checked'])
+TEXT_COLUMNS = ['centris_id', 'address', 'url', 'extraction_date', 'last_checked']
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+CHUNK_ROWS = 1000
+
+
+def parse_export_query(args):
+    """Validate export args (format plus the listing query args); raises ValueError on bad input."""
+    export_format = args.get('format') or 'csv'
+    if export_format not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    if export_format == 'parquet' and pyarrow is None:
+        raise ValueError("Parquet export needs pyarrow (pip install pyarrow)")
+    query = parse_listing_query(args, allowed_fields=EXPORT_COLUMNS)
+    query['format'] = export_format
+    query['fields'] = query['fields'] or EXPORT_COLUMNS
+    return query
+
+
+def export_row(record, columns):
+    total_assessment, price_per_sqft = derived_fields(record)
+    row = dict(record, assessment=total_assessment, price_per_sqft=price_per_sqft)
+    return {column: row.get(column) for column in columns}
+
+
+def iter_chunks(store, query):
+    """Yield lists of at most CHUNK_ROWS export rows."""
+    rows = store.query(query['filters'], query['sort'], query['descending'], query['after'], query['limit'],
+                       priced_only=False)
+    chunk = []
+    for _, record in rows:
+        chunk.append(export_row(record, query['fields']))
+        if len(chunk) == CHUNK_ROWS:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class ChunkSink(io.RawIOBase):
+    """Write-only file collecting what is written until take() is called."""
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        # Parquet records absolute offsets, so this counts everything ever written
+        return self.position
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def export_csv(chunks, columns):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, lineterminator='\n')
+    writer.writeheader()
+    for chunk in chunks:
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+def export_jsonl(chunks):
+    for chunk in chunks:
+        yield ''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in chunk).encode('utf-8')
+
+
+def export_parquet(chunks, columns):
+    # One row group per chunk
+    schema = pyarrow.schema([(column, pyarrow.string() if column in TEXT_COLUMNS else pyarrow.int64())
+                             for column in columns])
+    sink = ChunkSink()
+    with parquet.ParquetWriter(sink, schema) as writer:
+        for chunk in chunks:
+            writer.write_table(pyarrow.Table.from_pylist(chunk, schema=schema))
+            yield sink.take()
+    yield sink.take()
+
+
+def export_listings(store, query):
+    """Yield the export file for a parsed export query as chunks of bytes."""
+    chunks = iter_chunks(store, query)
+    if query['format'] == 'csv':
+        return export_csv(chunks, query['fields'])
+    if query['format'] == 'jsonl':
+        return export_jsonl(chunks)
+    return export_parquet(chunks, query['fields'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the listings as CSV, JSON Lines or Parquet.")
+    parser.add_argument('--format', choices=list(FORMATS), default='csv')
+    parser.add_argument('--output', default='-', help="output file (default: standard output)")
+    for name in RANGE_EXPRESSIONS:
+        option = name.replace('_', '-')
+        parser.add_argument(f'--min-{option}', dest=f'min_{name}', help=f"minimum {name}")
+        parser.add_argument(f'--max-{option}', dest=f'max_{name}', help=f"maximum {name}")
+    parser.add_argument('--fields', help=f"comma-separated columns among {','.join(EXPORT_COLUMNS)}")
+    parser.add_argument('--sort', help="sort key, '-' for descending as in --sort=-price (default centris_id)")
+    parser.add_argument('--limit', help="export at most this many listings")
+    args = parser.parse_args(argv)
+
+    try:
+        query = parse_export_query({name: value for name, value in vars(args).items() if value is not None})
+    except ValueError as e:
+        parser.error(str(e))
+
+    output = sys.stdout.buffer if args.output == '-' else open(args.output, 'wb')
+    try:
+        for data in export_listings(get_store(), query):
+            output.write(data)
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
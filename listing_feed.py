@@ -0,0 +1,136 @@
+"""Live feed of saved listings for the chart, as server-sent events.
+
+Code that saves a listing calls LISTING_FEED.notify(), which only wakes the
+feed.  The feed then reads the store rows written since its last write
+sequence, once per process however many clients are listening, and turns
+each changed chart data point into one serialized 'listing' event kept in
+a ring buffer.  Every open stream sends the same bytes.
+
+Listings saved by other processes (web workers, batch runs, the crawler)
+are picked up the same way, by checking the store's write sequence at most
+once per check interval.  Event ids are store sequence numbers, so a
+reconnecting EventSource resumes from its Last-Event-ID; a client that
+fell further behind than the ring buffer gets a 'reset' event and should
+reload its data.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+from listing_index import build_data_point
+from listing_store import SeqWatcher
+from metrics import log_event
+
+
+class ListingFeed:
+    """Broadcast of new and updated chart data points, read from the store by write sequence."""
+
+    def __init__(self, store=None, check_interval=1.0, backlog=1000):
+        # Only listings saved from the first poll on are pushed
+        self.watcher = SeqWatcher(store, check_interval, seq=None)
+        self.check_interval = check_interval
+        # (seq, event bytes), oldest first
+        self.events = deque(maxlen=backlog)
+        self.changed = threading.Condition()
+        self.poll_lock = threading.Lock()
+        self.dirty = False
+        # Write sequence the feed started at: earlier changes were never events
+        self.start_seq = None
+        # centris_id -> digest of the last data point sent
+        self.digests = {}
+
+    def notify(self):
+        """Tell the feed a listing was just saved in this process."""
+        with self.changed:
+            self.dirty = True
+            self.changed.notify_all()
+
+    def poll(self):
+        """Turn the rows written since the last poll into events, if due; one caller at a time."""
+        if not self.poll_lock.acquire(blocking=False):
+            return
+        try:
+            with self.changed:
+                # Cleared before reading, so a save made during the read is picked up next time
+                force = self.dirty
+                self.dirty = False
+            rows = self.watcher.poll(force)
+            if self.start_seq is None:
+                self.start_seq = self.watcher.seq
+            if rows is None:
+                return
+            events = []
+            for seq, record in rows:
+                event = self._event(seq, record)
+                if event is not None:
+                    events.append((seq, event))
+            if events:
+                with self.changed:
+                    self.events.extend(events)
+                    self.changed.notify_all()
+        finally:
+            self.poll_lock.release()
+
+    def _event(self, seq, record):
+        centris_id = record.get('centris_id', '')
+        try:
+            point = build_data_point(record)
+        except Exception as e:
+            log_event('feed_record_failed', logging.WARNING, centris_id=centris_id, error=str(e))
+            return None
+        if point is None:
+            return None
+        data = json.dumps(point, ensure_ascii=False)
+        # Saves that leave the point as it was (such as a 304 revalidation) are not sent
+        digest = hashlib.md5(data.encode('utf-8')).digest()
+        if self.digests.get(centris_id) == digest:
+            return None
+        self.digests[centris_id] = digest
+        return f"id: {seq}\nevent: listing\ndata: {data}\n\n".encode('utf-8')
+
+    def stream(self, last_event_id=None, heartbeat=15):
+        """Yield server-sent events for listings saved after last_event_id (default: from now on)."""
+        self.poll()
+        reset = False
+        with self.changed:
+            position = self.watcher.seq or 0
+            if last_event_id is not None and last_event_id < position:
+                # Events after `floor` are all still in the ring buffer
+                full = len(self.events) == self.events.maxlen
+                floor = self.events[0][0] - 1 if full else self.start_seq
+                if floor is not None and last_event_id >= floor:
+                    position = last_event_id
+                else:
+                    reset = True
+        # Sends the response headers right away, so the client knows it is connected
+        yield b": listening\n\n"
+        if reset:
+            yield f"id: {position}\nevent: reset\ndata: {{}}\n\n".encode('utf-8')
+
+        last_sent = time.monotonic()
+        while True:
+            self.poll()
+            with self.changed:
+                pending = []
+                for seq, event in reversed(self.events):
+                    if seq <= position:
+                        break
+                    pending.append(event)
+                if pending:
+                    position = self.events[-1][0]
+                    pending.reverse()
+                elif not self.dirty or self.poll_lock.locked():
+                    self.changed.wait(self.check_interval)
+            if pending:
+                last_sent = time.monotonic()
+                yield b''.join(pending)
+            elif time.monotonic() - last_sent >= heartbeat:
+                last_sent = time.monotonic()
+                # Comment line to keep proxies from closing an idle stream
+                yield b": keepalive\n\n"
+
+
+LISTING_FEED = ListingFeed()
@@ -0,0 +1,116 @@
+"""Process-wide in-memory index of the listings in the store.
+
+The index keeps one chart data point per listing, the serialized
+/api/property-data payload and the /api/chart-data payloads built so far.  refresh() checks the store at most once per
+check interval and only loads the rows written since the last refresh, so
+requests are answered from memory.
+"""
+import hashlib
+import json
+import logging
+import threading
+
+from chart_data import chart_payload
+from listing_store import SeqWatcher
+from metrics import log_event, stage
+from photos import thumbnail_path
+
+
+def derived_fields(property_data):
+    """Return (total assessment, price per sqft) of a listing record, None where unknown."""
+    price = property_data.get('price')
+    terrain = property_data.get('municipal_terrain')
+    building = property_data.get('municipal_building')
+    sqft = property_data.get('sqft')
+    total_assessment = terrain + building if terrain and building else None
+    return total_assessment, round(price / sqft) if price and sqft else None
+
+
+def build_data_point(property_data):
+    """Build the chart data point for a listing record, or None if it has no price."""
+    price = property_data.get('price')
+    if not price:
+        return None
+
+    total_assessment, price_per_sqft = derived_fields(property_data)
+    return {
+        'price': price,
+        'assessment': total_assessment,
+        'sqft': property_data.get('sqft'),
+        'price_per_sqft': price_per_sqft,
+        'address': property_data.get('address') or 'Unknown',
+        'centris_id': property_data.get('centris_id') or '',
+        'photo_path': property_data.get('photo_path'),
+        'thumb_path': thumbnail_path(property_data, 'md')
+    }
+
+
+class ListingIndex:
+    """Chart data points for every listing in the store, kept in sync by write sequence."""
+
+    def __init__(self, store=None, check_interval=1.0, chart_max_points=5000):
+        self.watcher = SeqWatcher(store, check_interval)
+        self.lock = threading.Lock()
+        # centris_id -> data point (None if the listing has no price)
+        self.points = {}
+        # Data points with a price, by centris_id
+        self.point_list = []
+        self.body = b'[]'
+        self.etag = hashlib.md5(self.body).hexdigest()
+        # Only payloads downsampled to this many points (or not at all) are cached
+        self.chart_max_points = chart_max_points
+        # (y, max_points, encoding) -> (payload bytes, etag), until the next change
+        self.chart_payloads = {}
+
+    def refresh(self, force=False):
+        """Load listings written since the last refresh; return True if the index changed."""
+        with self.lock:
+            rows = self.watcher.poll(force)
+            if rows is None:
+                return False
+            with stage('index_load'):
+                self._load_changes(rows)
+            return True
+
+    def _load_changes(self, rows):
+        # Called with the lock held
+        for _, record in rows:
+            centris_id = record.get('centris_id', '')
+            try:
+                self.points[centris_id] = build_data_point(record)
+            except Exception as e:
+                log_event('index_record_failed', logging.WARNING, centris_id=centris_id, error=str(e))
+                self.points.pop(centris_id, None)
+
+        self.point_list = [point for _, point in sorted(self.points.items()) if point]
+        self.body = json.dumps(self.point_list).encode('utf-8')
+        self.etag = hashlib.md5(self.body).hexdigest()
+        self.chart_payloads = {}
+
+    def snapshot(self):
+        """Return (payload bytes, etag) for the current set of data points."""
+        self.refresh()
+        with self.lock:
+            return self.body, self.etag
+
+    def chart_snapshot(self, y, max_points, encoding='json'):
+        """Return (payload bytes, etag) of the columnar chart payload.
+
+        Payloads for the configured chart_max_points are built once per
+        change; other sizes are built on every call, so arbitrary client
+        values cannot pile up in memory.
+        """
+        self.refresh()
+        with self.lock:
+            # Payloads that are not downsampled are the same for every y
+            downsampled = len(self.point_list) > max_points
+            key = (y, max_points, encoding) if downsampled else (None, None, encoding)
+            cached = self.chart_payloads.get(key)
+            if cached is None:
+                with stage('chart_payload'):
+                    payload = chart_payload(self.point_list, y, max_points, encoding)
+                body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+                cached = (body, hashlib.md5(body).hexdigest())
+                if not downsampled or max_points == self.chart_max_points:
+                    self.chart_payloads[key] = cached
+            return cached
@@ -0,0 +1,85 @@
+"""Fetch-once, parse-once scraping pipeline.
+
+A listing page is fetched and parsed a single time into a Page; every
+registered extractor then runs over the shared soup and the flattened
+texts memoized on it:
+
+    results = scrape(url)   # {'listing': {...}, 'photo_url': ..., 'details': {...}, 'condo_fee': 949}
+
+Extractors are registered by the modules that own them with the
+@extractor('name') decorator.  condo_extractor.extract_listing_data,
+condo_analyzer.scrape_centris, condofee.get_condo_fee and
+scraper.scrape_website are thin wrappers around this pipeline.
+"""
+import requests
+
+from html_parser import make_soup
+from metrics import stage
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+                  "AppleWebKit/537.36 (KHTML, like Gecko) "
+                  "Chrome/120.0 Safari/537.36"
+}
+# Seconds to connect and, separately, to wait for data before giving up on a request
+REQUEST_TIMEOUT = 30
+
+# name -> function(page), in registration order
+EXTRACTORS = {}
+
+
+class Page:
+    """A fetched page, parsed once and shared by every extractor."""
+
+    def __init__(self, url, html):
+        self.url = url
+        self.html = html
+        with stage('parse'):
+            self.soup = make_soup(html)
+        self._memo = {}
+
+    def memo(self, key, compute):
+        """Return compute(page), computed only once per page for each key."""
+        if key not in self._memo:
+            self._memo[key] = compute(self)
+        return self._memo[key]
+
+
+def extractor(name):
+    """Decorator registering a function(page) as the extractor for name."""
+    def register(fn):
+        EXTRACTORS[name] = fn
+        return fn
+    return register
+
+
+def load_extractors():
+    """Import the modules that register extractors."""
+    import condo_extractor  # noqa: F401
+    import condo_analyzer  # noqa: F401
+    import condofee  # noqa: F401
+
+
+def fetch(url, session=None, headers=HEADERS, timeout=REQUEST_TIMEOUT):
+    """GET a page and return the response, raising on HTTP errors and timeouts."""
+    http = session or requests
+    with stage('fetch'):
+        resp = http.get(url, headers=headers, timeout=timeout)
+        resp.raise_for_status()
+    return resp
+
+
+def fetch_page(url, session=None, headers=HEADERS):
+    """Fetch and parse a page."""
+    return Page(url, fetch(url, session, headers).text)
+
+
+def run_extractors(page, names=None):
+    """Run the named extractors (default: all of them) over a page and return {name: result}."""
+    load_extractors()
+    return {name: EXTRACTORS[name](page) for name in (names or list(EXTRACTORS))}
+
+
+def scrape(url, names=None, session=None):
+    """Fetch and parse url once and return {name: result} for the named extractors."""
+    return run_extractors(fetch_page(url, session), names)
@@ -0,0 +1,135 @@
+"""Query parameters for the listing APIs.
+
+/api/property-data accepts:
+
+    min_price, max_price, min_sqft, max_sqft, min_bedrooms, max_bedrooms,
+    min_year, max_year, min_price_per_sqft, max_price_per_sqft
+        inclusive range filters
+    fields=price,address,...   return only these data point fields
+    sort=price | -price        sort key, '-' for descending (default centris_id)
+    limit=N, cursor=...        page size and the next_cursor of the previous page
+
+The filters run in SQL against the store's indexed columns and matching
+rows are streamed to the client as they are read.
+"""
+import base64
+import json
+import logging
+
+from listing_index import build_data_point
+from listing_store import RANGE_EXPRESSIONS, SORT_EXPRESSIONS
+from metrics import log_event
+
+POINT_FIELDS = ['price', 'assessment', 'sqft', 'price_per_sqft', 'address', 'centris_id', 'photo_path', 'thumb_path']
+MAX_LIMIT = 10000
+
+
+def encode_cursor(sort_key, centris_id):
+    """Encode the position after a row as an opaque cursor string."""
+    raw = json.dumps([sort_key, centris_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        sort_key, centris_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return sort_key, centris_id
+
+
+def parse_number(args, name):
+    value = args.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number")
+
+
+def parse_listing_query(args, allowed_fields=POINT_FIELDS):
+    """Validate request args into a query dict; raises ValueError on bad input."""
+    filters = {}
+    for name in RANGE_EXPRESSIONS:
+        low = parse_number(args, f'min_{name}')
+        high = parse_number(args, f'max_{name}')
+        if low is not None or high is not None:
+            filters[name] = (low, high)
+
+    fields = None
+    if args.get('fields'):
+        fields = [field.strip() for field in args['fields'].split(',') if field.strip()]
+        unknown = [field for field in fields if field not in allowed_fields]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+    sort = args.get('sort') or 'centris_id'
+    descending = sort.startswith('-')
+    sort = sort.lstrip('-')
+    if sort not in SORT_EXPRESSIONS:
+        raise ValueError(f"Cannot sort by {sort}")
+
+    limit = None
+    if args.get('limit'):
+        try:
+            limit = int(args['limit'])
+        except ValueError:
+            raise ValueError("limit must be an integer")
+        if not 1 <= limit <= MAX_LIMIT:
+            raise ValueError(f"limit must be between 1 and {MAX_LIMIT}")
+
+    after = decode_cursor(args['cursor']) if args.get('cursor') else None
+
+    return {
+        'filters': filters,
+        'fields': fields,
+        'sort': sort,
+        'descending': descending,
+        'limit': limit,
+        'after': after,
+    }
+
+
+def iter_data_points(store, query):
+    """Yield (sort_key, centris_id, data point) for the listings matching a parsed query.
+
+    The data point is None for a listing that cannot be shown, so callers
+    can still advance the pagination cursor past it.
+    """
+    rows = store.query(query['filters'], query['sort'], query['descending'], query['after'], query['limit'])
+    for sort_key, record in rows:
+        centris_id = record.get('centris_id', '')
+        try:
+            point = build_data_point(record)
+        except Exception as e:
+            log_event('query_record_failed', logging.WARNING, centris_id=centris_id, error=str(e))
+            point = None
+        if point and query['fields']:
+            point = {field: point[field] for field in query['fields']}
+        yield sort_key, centris_id, point
+
+
+def stream_data_points(store, query):
+    """Yield the JSON response body in chunks, one data point at a time.
+
+    Without a limit the body is a JSON array like the unfiltered endpoint;
+    with a limit it is {"items": [...], "next_cursor": ...} where
+    next_cursor is null on the last page.
+    """
+    paginated = query['limit'] is not None
+    yield '{"items": [' if paginated else '['
+    rows = 0
+    written = 0
+    last = None
+    for sort_key, centris_id, point in iter_data_points(store, query):
+        rows += 1
+        last = (sort_key, centris_id)
+        if point:
+            yield (',' if written else '') + json.dumps(point)
+            written += 1
+    if not paginated:
+        yield ']'
+        return
+    next_cursor = encode_cursor(*last) if rows == query['limit'] else None
+    yield '], "next_cursor": ' + json.dumps(next_cursor) + '}'
@@ -0,0 +1,94 @@
+"""Typed listing records and their schema version.
+
+Records used to be stored exactly as scraped: every number a string
+("399000"), and missing values either null or absent.  Since schema
+version 2 every record is normalized when it is written: numeric fields are
+ints, every known field is present (None when missing) and the record
+carries "schema_version".  Older records are upgraded when they are read,
+and rewritten in place with
+
+    python listing_store.py upgrade
+
+ListingRecord holds one record in __slots__, for code keeping many
+records in memory.
+"""
+
+SCHEMA_VERSION = 2
+
+INTEGER_FIELDS = [
+    'price', 'bedrooms', 'bathrooms', 'sqft', 'year_of_construction',
+    'municipal_assessment_total', 'municipal_terrain', 'municipal_building',
+    'taxes_municipal', 'taxes_school', 'condo_fee',
+]
+TEXT_FIELDS = [
+    'address', 'url', 'centris_id', 'extraction_date', 'last_checked', 'photo_url',
+    'photo_path', 'page_archive', 'http_etag', 'http_last_modified',
+]
+# Output order: the scraped fields, then the metadata
+RECORD_FIELDS = (['address'] + INTEGER_FIELDS + [field for field in TEXT_FIELDS if field != 'address']
+                 + ['photo_thumbnails'])
+
+
+def to_int(value):
+    """Convert a scraped or stored value ("1 089 000", "399000", 399000, None) to int, or None."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        return round(value)
+    digits = str(value).replace('\xa0', '').replace(' ', '').replace(',', '')
+    try:
+        return int(digits)
+    except ValueError:
+        try:
+            return round(float(digits))
+        except ValueError:
+            return None
+
+
+def to_text(value):
+    if value is None or value == '':
+        return None
+    return str(value)
+
+
+class ListingRecord:
+    """One listing with typed fields; unknown keys are kept in `extra`."""
+
+    __slots__ = RECORD_FIELDS + ['extra']
+
+    def __init__(self, **fields):
+        for field in INTEGER_FIELDS:
+            setattr(self, field, to_int(fields.pop(field, None)))
+        for field in TEXT_FIELDS:
+            setattr(self, field, to_text(fields.pop(field, None)))
+        self.photo_thumbnails = fields.pop('photo_thumbnails', None) or None
+        fields.pop('schema_version', None)
+        self.extra = fields or None
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def __repr__(self):
+        return f'ListingRecord({self.centris_id!r}, price={self.price!r})'
+
+    def to_dict(self):
+        data = {field: getattr(self, field) for field in RECORD_FIELDS}
+        if self.extra:
+            data.update(self.extra)
+        data['schema_version'] = SCHEMA_VERSION
+        return data
+
+
+def normalize_record(data):
+    """Return a copy of a record dict with typed fields in the current schema."""
+    return ListingRecord.from_dict(data).to_dict()
+
+
+def upgrade_record(data):
+    """Return the record in the current schema (the same dict if it already is)."""
+    if data.get('schema_version') == SCHEMA_VERSION:
+        return data
+    return normalize_record(data)
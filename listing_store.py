@@ -0,0 +1,426 @@
+"""SQLite-backed listing store.
+
+Each listing is one row keyed by centris_id.  The full extracted record is
+kept as JSON so get_cached_data returns the whole record, and the
+numeric fields are also stored in typed, indexed columns for range queries.
+The database runs in WAL mode so readers never block the writer.
+
+Every write bumps the row's `seq` to a new, store-wide maximum, so readers
+such as the chart index can fetch only the rows changed since they last looked.
+SeqWatcher does that bookkeeping for the in-memory views of the store.
+
+Records are normalized to the typed schema of listing_record when written.
+Import the legacy one-file-per-listing cache (and its photos), or rewrite
+records saved with an older schema version, with:
+
+    python listing_store.py migrate [data_dir]
+    python listing_store.py upgrade
+"""
+import glob
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from atomic_io import LOCK_DIR, file_lock
+from listing_record import SCHEMA_VERSION, normalize_record, to_int, upgrade_record
+from metrics import log_event
+from photos import import_legacy_photos
+
+DB_PATH = os.path.join('data', 'listings.db')
+
+# Typed columns, in addition to the JSON record
+INTEGER_COLUMNS = [
+    'price', 'sqft', 'bedrooms', 'bathrooms', 'year_of_construction',
+    'municipal_assessment_total', 'municipal_terrain', 'municipal_building',
+    'taxes_municipal', 'taxes_school', 'condo_fee',
+]
+INDEXED_COLUMNS = [
+    'price', 'sqft', 'year_of_construction', 'condo_fee', 'taxes_municipal',
+    'taxes_school', 'municipal_assessment_total',
+]
+
+# SQL for the derived values the chart shows, matching listing_index.build_data_point
+ASSESSMENT_SQL = 'CASE WHEN municipal_terrain AND municipal_building THEN municipal_terrain + municipal_building END'
+PRICE_PER_SQFT_SQL = 'CASE WHEN sqft THEN ROUND(CAST(price AS REAL) / sqft) END'
+
+# Columns usable in range filters and as sort keys
+RANGE_EXPRESSIONS = {
+    'price': 'price',
+    'sqft': 'sqft',
+    'bedrooms': 'bedrooms',
+    'year': 'year_of_construction',
+    'price_per_sqft': PRICE_PER_SQFT_SQL,
+}
+SORT_EXPRESSIONS = dict(RANGE_EXPRESSIONS, assessment=ASSESSMENT_SQL, centris_id='centris_id')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    centris_id TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    address TEXT,
+    extraction_date TEXT,
+    {columns},
+    record TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_listings_seq ON listings (seq);
+{indexes}
+CREATE TABLE IF NOT EXISTS listing_changes (
+    id INTEGER PRIMARY KEY,
+    centris_id TEXT NOT NULL,
+    changed_at TEXT NOT NULL,
+    old_price INTEGER,
+    new_price INTEGER,
+    changes TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_listing_changes_centris_id ON listing_changes (centris_id, changed_at);
+CREATE INDEX IF NOT EXISTS idx_listing_changes_changed_at ON listing_changes (changed_at);
+""".format(
+    columns=',\n    '.join(f'{column} INTEGER' for column in INTEGER_COLUMNS),
+    indexes='\n'.join(f'CREATE INDEX IF NOT EXISTS idx_listings_{column} ON listings ({column});'
+                      for column in INDEXED_COLUMNS),
+)
+
+
+def load_record(text):
+    """Decode a stored record, upgrading it if it predates the current schema."""
+    return upgrade_record(json.loads(text))
+
+
+class ListingStore:
+    """Listing records in an SQLite database, with one connection per thread."""
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self.local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self.connect()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(SCHEMA)
+
+    def connect(self):
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self.local.conn = conn
+        return conn
+
+    def get(self, centris_id):
+        """Return the saved record for a Centris ID, or None."""
+        row = self.connect().execute(
+            'SELECT record FROM listings WHERE centris_id = ?', (str(centris_id),)).fetchone()
+        return load_record(row['record']) if row else None
+
+    def save(self, centris_id, data):
+        """Insert or replace the record for a Centris ID; return the write's sequence number."""
+        return self.save_many([(centris_id, data)])
+
+    def save_many(self, items):
+        """Insert or replace many (centris_id, record) pairs in one transaction; return the last seq."""
+        conn = self.connect()
+        with conn:
+            # BEGIN IMMEDIATE takes the write lock before reading MAX(seq)
+            conn.execute('BEGIN IMMEDIATE')
+            return self._write(conn, items)
+
+    def _write(self, conn, items):
+        # Must run inside a write transaction
+        columns = ['centris_id', 'seq', 'address', 'extraction_date'] + INTEGER_COLUMNS + ['record']
+        sql = 'INSERT OR REPLACE INTO listings ({}) VALUES ({})'.format(
+            ', '.join(columns), ', '.join('?' for _ in columns))
+        seq = conn.execute('SELECT COALESCE(MAX(seq), 0) FROM listings').fetchone()[0]
+        for centris_id, data in items:
+            data = normalize_record(data)
+            seq += 1
+            values = [str(centris_id), seq, data.get('address'), data.get('extraction_date')]
+            values += [to_int(data.get(column)) for column in INTEGER_COLUMNS]
+            values.append(json.dumps(data, ensure_ascii=False))
+            conn.execute(sql, values)
+        return seq
+
+    def save_with_changes(self, centris_id, data, changes, changed_at):
+        """Save a record and append the delta {field: [old, new]} to its history, atomically.
+
+        Returns the write's sequence number.
+        """
+        conn = self.connect()
+        old_price, new_price = changes.get('price', (None, None))
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            seq = self._write(conn, [(centris_id, data)])
+            conn.execute(
+                'INSERT INTO listing_changes (centris_id, changed_at, old_price, new_price, changes) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (str(centris_id), changed_at, to_int(old_price), to_int(new_price),
+                 json.dumps(changes, ensure_ascii=False)))
+        return seq
+
+    def history(self, centris_id):
+        """Return the dated field changes of a listing, oldest first."""
+        rows = self.connect().execute(
+            'SELECT changed_at, changes FROM listing_changes WHERE centris_id = ? ORDER BY changed_at, id',
+            (str(centris_id),))
+        return [{'changed_at': row['changed_at'], 'changes': json.loads(row['changes'])} for row in rows]
+
+    def price_drops(self, since=None, limit=100):
+        """Return the most recent price decreases, optionally only those at or after `since` (ISO date)."""
+        sql = ('SELECT centris_id, changed_at, old_price, new_price FROM listing_changes '
+               'WHERE new_price < old_price')
+        params = []
+        if since:
+            sql += ' AND changed_at >= ?'
+            params.append(since)
+        sql += ' ORDER BY changed_at DESC LIMIT ?'
+        params.append(limit)
+        return [dict(row) for row in self.connect().execute(sql, params)]
+
+    def stale_urls(self, checked_before):
+        """Return the URLs of listings last checked before the given ISO timestamp."""
+        rows = self.connect().execute(
+            "SELECT json_extract(record, '$.url') AS url FROM listings "
+            "WHERE COALESCE(json_extract(record, '$.last_checked'), extraction_date, '') < ?",
+            (checked_before,))
+        return [row['url'] for row in rows if row['url']]
+
+    def known_ids(self, centris_ids):
+        """Return the subset of centris_ids that have a saved record."""
+        centris_ids = [str(centris_id) for centris_id in centris_ids]
+        if not centris_ids:
+            return set()
+        rows = self.connect().execute(
+            f"SELECT centris_id FROM listings WHERE centris_id IN ({', '.join('?' for _ in centris_ids)})",
+            centris_ids)
+        return {row['centris_id'] for row in rows}
+
+    def update(self, centris_id, fields):
+        """Merge fields into a saved record; returns False if there is no such record."""
+        conn = self.connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT record FROM listings WHERE centris_id = ?', (str(centris_id),)).fetchone()
+            if row is None:
+                return False
+            data = load_record(row['record'])
+            data.update(fields)
+            self._write(conn, [(centris_id, data)])
+        return True
+
+    def max_seq(self):
+        """Return the sequence number of the most recent write (0 if empty)."""
+        return self.connect().execute('SELECT COALESCE(MAX(seq), 0) FROM listings').fetchone()[0]
+
+    def changed_since(self, seq):
+        """Yield (seq, record) for every listing written after seq, oldest first."""
+        rows = self.connect().execute(
+            'SELECT seq, record FROM listings WHERE seq > ? ORDER BY seq', (seq,))
+        for row in rows:
+            yield row['seq'], load_record(row['record'])
+
+    def changed_ids_since(self, seq):
+        """Return [(seq, centris_id)] for every listing written after seq, oldest first."""
+        rows = self.connect().execute(
+            'SELECT seq, centris_id FROM listings WHERE seq > ? ORDER BY seq', (seq,))
+        return [(row['seq'], row['centris_id']) for row in rows]
+
+    def column_values(self, columns):
+        """Return [(centris_id, *values)] of the given typed columns for every listing with a price."""
+        unknown = set(columns) - set(INTEGER_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(sorted(unknown))}")
+        sql = f"SELECT centris_id, {', '.join(columns)} FROM listings WHERE price IS NOT NULL ORDER BY centris_id"
+        return self.connect().execute(sql).fetchall()
+
+    def query(self, filters=None, sort='centris_id', descending=False, after=None, limit=None, priced_only=True):
+        """Yield (sort_key, record) for listings matching the range filters.
+
+        filters maps a RANGE_EXPRESSIONS name to a (min, max) pair, either end
+        may be None.  Rows are ordered by the SORT_EXPRESSIONS key then
+        centris_id; after=(sort_key, centris_id) resumes after that row
+        (keyset pagination).  Rows are fetched lazily from the cursor.
+        Listings without a price are skipped unless priced_only is False.
+        """
+        where = ['price IS NOT NULL', 'price != 0'] if priced_only else ['1']
+        params = []
+        for name, (low, high) in (filters or {}).items():
+            expression = RANGE_EXPRESSIONS[name]
+            if low is not None:
+                where.append(f'{expression} >= ?')
+                params.append(low)
+            if high is not None:
+                where.append(f'{expression} <= ?')
+                params.append(high)
+
+        # Listings missing the sort value sort first (last when descending)
+        key = 'centris_id' if sort == 'centris_id' else f'IFNULL({SORT_EXPRESSIONS[sort]}, -1)'
+        direction = 'DESC' if descending else 'ASC'
+        if after is not None:
+            op = '<' if descending else '>'
+            where.append(f'({key}, centris_id) {op} (?, ?)')
+            params.extend(after)
+
+        sql = (f'SELECT {key} AS sort_key, record FROM listings WHERE {" AND ".join(where)} '
+               f'ORDER BY sort_key {direction}, centris_id {direction}')
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        for row in self.connect().execute(sql, params):
+            yield row['sort_key'], load_record(row['record'])
+
+    def count(self):
+        return self.connect().execute('SELECT COUNT(*) FROM listings').fetchone()[0]
+
+
+def migrate_json_dir(store, data_dir='data'):
+    """Import every legacy data/*.json record into the store; return the number imported."""
+    items = []
+    for file_path in sorted(glob.glob(os.path.join(data_dir, '*.json'))):
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            log_event('migrate_record_failed', logging.WARNING, file=os.path.basename(file_path), error=str(e))
+            continue
+        centris_id = data.get('centris_id') or os.path.splitext(os.path.basename(file_path))[0]
+        items.append((centris_id, data))
+    store.save_many(items)
+    return len(items)
+
+
+def upgrade_records(store, batch_size=1000):
+    """Rewrite every record stored with an older schema version; return the number upgraded."""
+    conn = store.connect()
+    upgraded = 0
+    while True:
+        rows = conn.execute(
+            "SELECT centris_id, record FROM listings "
+            "WHERE json_extract(record, '$.schema_version') IS NOT ? LIMIT ?",
+            (SCHEMA_VERSION, batch_size)).fetchall()
+        if not rows:
+            return upgraded
+        store.save_many([(row['centris_id'], json.loads(row['record'])) for row in rows])
+        upgraded += len(rows)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Return the process-wide store, importing the legacy JSON cache on first creation."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            # Only one process creates the database and runs the import
+            with file_lock(os.path.join(LOCK_DIR, 'store.lock')):
+                is_new = not os.path.exists(DB_PATH)
+                store = ListingStore(DB_PATH)
+                if is_new:
+                    data_dir = os.path.dirname(DB_PATH) or '.'
+                    migrate_json_dir(store, data_dir)
+                    import_legacy_photos(store, data_dir)
+            _store = store
+        return _store
+
+
+class SeqWatcher:
+    """Follows the store's write sequence on behalf of an in-memory view of the store.
+
+    The store is checked at most once per check interval unless a check is
+    forced.  seq is the last write seen; with seq=None the watcher starts
+    from the store's latest write on its first check, so only later writes
+    are reported.  Without a store, the process-wide one is used.
+    """
+
+    def __init__(self, store=None, check_interval=1.0, seq=0):
+        self.store = store
+        self.check_interval = check_interval
+        self.seq = seq
+        self.last_check = None
+        self.lock = threading.Lock()
+
+    def get_store(self):
+        if self.store is None:
+            self.store = get_store()
+        return self.store
+
+    def due(self, force=False):
+        """Return True, and start a new check interval, if the store should be checked now."""
+        with self.lock:
+            now = time.monotonic()
+            if not force and self.last_check is not None and now - self.last_check < self.check_interval:
+                return False
+            self.last_check = now
+            return True
+
+    def changed(self, force=False):
+        """Return True if a check is due and the store was written since the last one."""
+        if not self.due(force):
+            return False
+        seq = self.get_store().max_seq()
+        with self.lock:
+            if seq == self.seq:
+                return False
+            self.seq = seq
+        return True
+
+    def poll(self, force=False):
+        """Return an iterator of (seq, record) over the rows written since the last poll.
+
+        Returns None when no check is due or nothing was written.  seq
+        advances as the rows are consumed.
+        """
+        if not self.due(force):
+            return None
+        store = self.get_store()
+        latest = store.max_seq()
+        if self.seq is None:
+            self.seq = latest
+            return None
+        if latest <= self.seq:
+            return None
+        return self._rows(store)
+
+    def _rows(self, store):
+        for seq, record in store.changed_since(self.seq):
+            self.seq = seq
+            yield seq, record
+
+    def poll_ids(self, force=False):
+        """Return [(seq, centris_id)] of the rows written since the last poll, without decoding them."""
+        if not self.due(force):
+            return []
+        store = self.get_store()
+        if self.seq is None:
+            latest = store.max_seq()
+            with self.lock:
+                self.seq = max(latest, self.seq or 0)
+            return []
+        changed = store.changed_ids_since(self.seq)
+        with self.lock:
+            if changed:
+                self.seq = max(changed[-1][0], self.seq)
+        return changed
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command not in ('migrate', 'upgrade'):
+        print("Usage: python listing_store.py migrate [data_dir] | upgrade")
+        sys.exit(1)
+    store = ListingStore(DB_PATH)
+    if command == 'upgrade':
+        count = upgrade_records(store)
+        print(f"Upgraded {count} records to schema version {SCHEMA_VERSION}")
+        sys.exit(0)
+    data_dir = sys.argv[2] if len(sys.argv) > 2 else 'data'
+    count = migrate_json_dir(store, data_dir)
+    photo_count = import_legacy_photos(store, data_dir)
+    print(f"Imported {count} listings and {photo_count} photos into {DB_PATH} ({store.count()} total)")
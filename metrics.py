@@ -0,0 +1,149 @@
+"""In-process metrics in Prometheus text format, and structured logs.
+
+Pipeline stages are timed with
+
+    with stage('fetch'):
+        ...
+
+which feeds the estate_stage_duration_seconds histogram (and the error
+counter if the block raises).  render() returns every metric in the
+Prometheus text exposition format for the /metrics endpoint.  Metrics are
+per process; with several workers each one is scraped separately.
+
+log_event() writes one JSON object per line to the 'estate' logger.
+"""
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REGISTRY = []
+logger = logging.getLogger('estate')
+
+
+def format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Counter:
+    """Monotonic counter, optionally split by labels."""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels):
+        return self.values.get(tuple(str(labels[name]) for name in self.labelnames), 0)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f'{self.name}{format_labels(self.labelnames, key)} {value}')
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram, optionally split by labels."""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # label values -> [bucket counts..., sum, count]
+        self.values = {}
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self.lock:
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            for key, series in sorted(self.values.items()):
+                for bound, count in zip(self.buckets, series):
+                    labels = format_labels(self.labelnames, key, [('le', repr(bound))])
+                    lines.append(f'{self.name}_bucket{labels} {count}')
+                labels = format_labels(self.labelnames, key, [('le', '+Inf')])
+                lines.append(f'{self.name}_bucket{labels} {series[-1]}')
+                lines.append(f'{self.name}_sum{format_labels(self.labelnames, key)} {series[-2]}')
+                lines.append(f'{self.name}_count{format_labels(self.labelnames, key)} {series[-1]}')
+        return lines
+
+
+STAGE_SECONDS = Histogram('estate_stage_duration_seconds', 'Time spent in each pipeline stage.', ['stage'])
+STAGE_ERRORS = Counter('estate_stage_errors_total', 'Pipeline stage failures.', ['stage'])
+CACHE_LOOKUPS = Counter('estate_cache_lookups_total', 'Listing cache lookups by result (hit or miss).', ['result'])
+MEMORY_CACHE_LOOKUPS = Counter('estate_memory_cache_lookups_total',
+                               'In-process listing LRU lookups by result (hit or miss).', ['result'])
+SINGLE_FLIGHT_SHARED = Counter('estate_single_flight_shared_total',
+                               'Listing loads that joined a load already in flight.')
+CRAWL_LISTINGS = Counter('estate_crawl_listings_total',
+                         'Listings found on search result pages by outcome (new, changed, unchanged, known).',
+                         ['result'])
+HTTP_REQUESTS = Counter('estate_http_requests_total', 'HTTP requests served.', ['endpoint', 'method', 'status'])
+HTTP_SECONDS = Histogram('estate_http_request_duration_seconds', 'HTTP request latency.', ['endpoint'])
+
+
+@contextmanager
+def stage(name):
+    """Time a pipeline stage into STAGE_SECONDS, counting failures in STAGE_ERRORS."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=name)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=name)
+
+
+def render():
+    """Return all metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def log_event(event, level=logging.INFO, **fields):
+    """Log one structured event as a JSON line."""
+    if logger.isEnabledFor(level):
+        logger.log(level, json.dumps(dict(fields, event=event), ensure_ascii=False, default=str))
+
+
+def configure_logging(level=logging.INFO):
+    """Send 'estate' log lines to stderr unless a handler is already configured."""
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(level)
+        logger.propagate = False
@@ -0,0 +1,114 @@
+"""Content-addressed listing photos and thumbnails.
+
+Photos are stored under data/photos/ named by the hash of their bytes, so a
+photo URL never changes content and can be served with an immutable
+Cache-Control header.  When Pillow is installed, the thumbnail sizes in
+THUMBNAIL_SIZES are generated alongside each photo; without it the full
+photo is used everywhere, and a warning is logged the first time a photo is
+saved.
+
+Downloads run on a small background pool (PHOTO_POOL) so they stay off the
+extraction critical path.
+"""
+import hashlib
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from atomic_io import atomic_write
+from metrics import log_event
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+PHOTO_DIR = os.path.join('data', 'photos')
+# Name -> bounding box; 'sm' for the index page, 'md' for the chart tooltip
+THUMBNAIL_SIZES = {
+    'sm': (160, 120),
+    'md': (384, 288),
+}
+
+PHOTO_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix='photo')
+
+# Set once the missing Pillow has been logged
+_pillow_missing_logged = False
+
+
+def log_pillow_missing():
+    """Log, once per process, that thumbnails are not generated because Pillow is missing."""
+    global _pillow_missing_logged
+    if not _pillow_missing_logged:
+        _pillow_missing_logged = True
+        log_event('thumbnails_disabled', logging.WARNING,
+                  error="Pillow is not installed (pip install Pillow); full-size photos are used instead")
+
+
+def make_thumbnail(content, size):
+    """Return JPEG bytes of the image scaled to fit within size."""
+    with Image.open(io.BytesIO(content)) as image:
+        image = image.convert('RGB')
+        image.thumbnail(size)
+        out = io.BytesIO()
+        image.save(out, 'JPEG', quality=80, optimize=True)
+        return out.getvalue()
+
+
+def save_photo(content, photo_dir=PHOTO_DIR, centris_id=None):
+    """Store photo bytes under their content hash and generate thumbnails.
+
+    Returns the record fields pointing at the stored files, relative to the
+    data directory: {'photo_path': ..., 'photo_thumbnails': {size: path}}.
+    Files that already exist are not rewritten, so identical photos share
+    storage.  centris_id only identifies the listing in log events.
+    """
+    os.makedirs(photo_dir, exist_ok=True)
+    digest = hashlib.sha256(content).hexdigest()[:20]
+    prefix = os.path.basename(photo_dir)
+
+    filename = f'{digest}.jpeg'
+    if not os.path.exists(os.path.join(photo_dir, filename)):
+        atomic_write(os.path.join(photo_dir, filename), content)
+
+    thumbnails = {}
+    if Image is None:
+        log_pillow_missing()
+    else:
+        for name, size in THUMBNAIL_SIZES.items():
+            thumb_name = f'{digest}_{name}.jpeg'
+            thumb_path = os.path.join(photo_dir, thumb_name)
+            if not os.path.exists(thumb_path):
+                try:
+                    atomic_write(thumb_path, make_thumbnail(content, size))
+                except Exception as e:
+                    log_event('thumbnail_failed', logging.WARNING, centris_id=centris_id, size=name,
+                              error=str(e))
+                    continue
+            thumbnails[name] = f'{prefix}/{thumb_name}'
+
+    return {'photo_path': f'{prefix}/{filename}', 'photo_thumbnails': thumbnails}
+
+
+def thumbnail_path(record, size):
+    """Return the stored path of a record's photo at the given size, falling back to the full photo."""
+    return (record.get('photo_thumbnails') or {}).get(size) or record.get('photo_path')
+
+
+def import_legacy_photos(store, data_dir='data'):
+    """Move photos saved as data/{centris_id}.jpeg into the content-addressed store.
+
+    Returns the number of listings updated.  The legacy files are left in place.
+    """
+    updated = 0
+    for _, record in list(store.changed_since(0)):
+        centris_id = record.get('centris_id')
+        legacy_path = os.path.join(data_dir, f'{centris_id}.jpeg')
+        if record.get('photo_path') != f'{centris_id}.jpeg' or not os.path.exists(legacy_path):
+            continue
+        with open(legacy_path, 'rb') as f:
+            fields = save_photo(f.read(), os.path.join(data_dir, 'photos'), centris_id=centris_id)
+        store.update(centris_id, fields)
+        updated += 1
+    return updated
@@ -1,19 +1,16 @@
 import requests
-from bs4 import BeautifulSoup
+from listing_pipeline import fetch_page, run_extractors
 
 def scrape_website(url):
     """
     Scrapes a website and returns the title, address, and other details.
     """
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
-        }
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()  # Raise an exception for bad status codes
-        soup = BeautifulSoup(response.text, 'html.parser')
+        page = fetch_page(url)
         with open("soup_output.html", "w", encoding="utf-8") as f:
-            f.write(soup.prettify())
+            f.write(page.soup.prettify())
+        title = page.soup.title.get_text(strip=True) if page.soup.title else None
+        return dict(run_extractors(page, ['listing'])['listing'], title=title)
         
     except requests.exceptions.RequestException as e:
         return {
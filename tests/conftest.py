@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the top of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import condo_extractor
+import listing_store
+from listing_cache import ListingCache
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """A fresh store in a temporary data directory, used as the process-wide store."""
+    monkeypatch.chdir(tmp_path)
+    # Absolute, so threads connecting after the test has changed directory still find it
+    store = listing_store.ListingStore(str(tmp_path / 'data' / 'listings.db'))
+    monkeypatch.setattr(listing_store, '_store', store)
+    monkeypatch.setattr(condo_extractor, 'LISTING_CACHE', ListingCache(store))
+    return store
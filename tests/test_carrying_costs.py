@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+from app import create_app
+from carrying_costs import parse_values
+
+
+@pytest.mark.parametrize('spec', ['inf', '4,inf', '-inf', 'nan', '0.1,nan', '3:inf:1', '3:7:nan', 'nan:7:1'])
+def test_parse_values_rejects_values_that_are_not_finite(spec):
+    with pytest.raises(ValueError):
+        parse_values(spec)
+
+
+def test_parse_values_builds_ranges_and_lists():
+    assert parse_values('3:4:0.5') == [3.0, 3.5, 4.0]
+    assert parse_values('25,20,25') == [20.0, 25.0]
+
+
+@pytest.mark.parametrize('query', ['years=inf', 'rates=inf', 'down=nan', 'rates=-inf&ids=111', 'budget=nan'])
+def test_api_answers_400_for_values_that_are_not_finite(store, query):
+    store.save('111', {'centris_id': '111', 'price': 400000, 'condo_fee': 300})
+    client = create_app().test_client()
+
+    response = client.get(f'/api/carrying-costs?{query}')
+
+    assert response.status_code == 400
+    assert 'error' in json.loads(response.get_data())
+
+
+def test_api_summarizes_finite_scenarios(store):
+    store.save('111', {'centris_id': '111', 'price': 400000, 'condo_fee': 300})
+    client = create_app().test_client()
+
+    response = client.get('/api/carrying-costs?rates=4,5&down=0.2&years=25&budget=3000')
+
+    assert response.status_code == 200
+    payload = json.loads(response.get_data())
+    assert payload['listings'] == 1
+    assert len(payload['scenarios']) == 2
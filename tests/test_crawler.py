@@ -0,0 +1,159 @@
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from crawler import crawl
+
+LISTING_PATH = '/fr/condo~a-vendre~montreal/{}'
+
+
+def result_page(listings, next_page=None):
+    cards = ''.join(
+        f'<div class="card"><a href="{LISTING_PATH.format(centris_id)}">Condo {centris_id}</a>'
+        f'<span class="price">{price} $</span></div>'
+        for centris_id, price in listings)
+    next_link = f'<a rel="next" href="{next_page}">Suivante</a>' if next_page else ''
+    return f'<html><body>{cards}{next_link}</body></html>'
+
+
+def listing_page(centris_id, price):
+    return (f'<html><body><h1>{centris_id}, Rue Example, app. 1</h1>'
+            f'<div class="price">{price} $</div></body></html>')
+
+
+class FixtureSite:
+    """Pages served by path from a local HTTP server, with a count of requests per path."""
+
+    def __init__(self):
+        self.pages = {}
+        self.errors = set()
+        self.hits = Counter()
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                site.hits[self.path] += 1
+                body = site.pages.get(self.path)
+                status = 500 if self.path in site.errors else 200 if body is not None else 404
+                data = (body or '').encode('utf-8') if status == 200 else b''
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def set_results(self, pages):
+        """Serve result pages /results/1, /results/2, ... each linking to the next."""
+        for number, listings in enumerate(pages, 1):
+            next_page = f'/results/{number + 1}' if number < len(pages) else None
+            self.pages[f'/results/{number}'] = result_page(listings, next_page)
+        for listings in pages:
+            for centris_id, price in listings:
+                self.pages[LISTING_PATH.format(centris_id)] = listing_page(centris_id, price)
+
+    def listing_hits(self, centris_id):
+        return self.hits[LISTING_PATH.format(centris_id)]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def site():
+    site = FixtureSite()
+    yield site
+    site.close()
+
+
+def run_crawl(site, store):
+    return crawl([site.url + '/results/1'], concurrency=2, rate=0, retries=0, store=store)
+
+
+def test_crawl_follows_next_links_and_extracts_each_listing_once(site, store):
+    # 111 is on the first two result pages
+    site.set_results([
+        [('111', 400000), ('112', 500000)],
+        [('111', 400000), ('113', 600000)],
+        [('114', 700000)],
+    ])
+
+    summary = run_crawl(site, store)
+
+    assert summary['pages'] == 3
+    assert (summary['new'], summary['changed'], summary['ok'], summary['failed']) == (4, 0, 4, 0)
+    for centris_id in ('111', '112', '113', '114'):
+        assert site.listing_hits(centris_id) == 1
+        assert store.get(centris_id)['centris_id'] == centris_id
+    assert store.get('113')['price'] == 600000
+
+
+def test_max_pages_stops_pagination(site, store):
+    site.set_results([[('111', 400000)], [('112', 500000)], [('113', 600000)]])
+
+    summary = crawl([site.url + '/results/1'], rate=0, retries=0, max_pages=2, store=store)
+
+    assert summary['pages'] == 2
+    assert site.hits['/results/3'] == 0
+    assert site.listing_hits('113') == 0
+
+
+def test_second_crawl_reports_new_changed_and_unchanged(site, store):
+    site.set_results([[('111', 400000), ('112', 500000)], [('113', 600000)]])
+    run_crawl(site, store)
+
+    # 112's price drops, 114 is listed, 111 and 113 stay as they were
+    site.set_results([[('111', 400000), ('112', 450000)], [('113', 600000), ('114', 700000)]])
+    summary = run_crawl(site, store)
+
+    assert {outcome: summary[outcome] for outcome in ('new', 'changed', 'unchanged', 'known')} == {
+        'new': 1, 'changed': 1, 'unchanged': 2, 'known': 0}
+    assert (summary['ok'], summary['failed']) == (2, 0)
+    assert site.listing_hits('111') == 1
+    assert site.listing_hits('113') == 1
+    assert site.listing_hits('112') == 2
+    assert site.listing_hits('114') == 1
+    assert store.get('112')['price'] == 450000
+
+
+def test_repeated_crawl_fetches_no_listing(site, store):
+    site.set_results([[('111', 400000), ('112', 500000)], [('112', 500000)]])
+    run_crawl(site, store)
+
+    summary = run_crawl(site, store)
+
+    assert (summary['new'], summary['changed'], summary['unchanged'], summary['ok']) == (0, 0, 2, 0)
+    assert site.listing_hits('111') == 1
+    assert site.listing_hits('112') == 1
+
+
+def test_listing_already_stored_is_not_fetched(site, store):
+    store.save('111', {'centris_id': '111', 'price': 400000})
+    site.set_results([[('111', 400000)]])
+
+    summary = run_crawl(site, store)
+
+    assert (summary['known'], summary['new'], summary['ok']) == (1, 0, 0)
+    assert site.listing_hits('111') == 0
+
+
+def test_failed_extraction_is_retried_on_next_crawl(site, store):
+    site.set_results([[('111', 400000), ('112', 500000)]])
+    site.errors.add(LISTING_PATH.format('112'))
+    summary = run_crawl(site, store)
+    assert (summary['ok'], summary['failed']) == (1, 1)
+
+    site.errors.clear()
+    summary = run_crawl(site, store)
+
+    assert (summary['new'], summary['unchanged'], summary['ok'], summary['failed']) == (1, 1, 1, 0)
+    assert store.get('112')['price'] == 500000
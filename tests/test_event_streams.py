@@ -0,0 +1,62 @@
+import threading
+
+import pytest
+import requests
+from werkzeug.serving import make_server
+
+import app as app_module
+from app import create_app
+from listing_feed import ListingFeed
+
+
+@pytest.fixture(autouse=True)
+def feed(store, monkeypatch):
+    monkeypatch.setattr(app_module, 'LISTING_FEED', ListingFeed(store))
+
+
+@pytest.fixture
+def server(store):
+    """The app on a local threaded server allowing two event streams at once."""
+    store.save('111', {'centris_id': '111', 'price': 400000})
+    server = make_server('127.0.0.1', 0, create_app({'EVENT_STREAMS_MAX': 2}), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+
+
+def open_stream(url):
+    response = requests.get(url, stream=True, timeout=5)
+    assert response.status_code == 200
+    assert next(response.iter_lines()) == b': listening'
+    return response
+
+
+def test_requests_are_served_while_streams_are_open(server):
+    streams = [open_stream(f'{server}/api/listings/events') for _ in range(2)]
+    try:
+        refused = requests.get(f'{server}/api/listings/events', timeout=5)
+        assert refused.status_code == 503
+        assert refused.headers['Retry-After']
+        # Job streams share the limit
+        assert requests.get(f'{server}/jobs/events?ids=unknown', timeout=5).status_code == 503
+
+        response = requests.get(f'{server}/api/property-data', timeout=5)
+        assert response.status_code == 200
+        assert [point['centris_id'] for point in response.json()] == ['111']
+    finally:
+        for stream in streams:
+            stream.close()
+
+
+def test_closed_stream_frees_its_slot(store):
+    client = create_app({'EVENT_STREAMS_MAX': 1}).test_client()
+
+    stream = client.get('/api/listings/events', buffered=False)
+    assert stream.status_code == 200
+    assert next(stream.response) == b': listening\n\n'
+    assert client.get('/api/listings/events', buffered=False).status_code == 503
+
+    stream.close()
+    again = client.get('/api/listings/events', buffered=False)
+    assert again.status_code == 200
+    again.close()
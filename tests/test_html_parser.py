@@ -0,0 +1,24 @@
+import os
+
+import pytest
+
+from condo_extractor import find_primary_photo_url, parse_listing_fields
+from html_parser import FALLBACK_PARSER, make_soup
+
+PAGE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'soup_output.html')
+
+
+def extract(html, parser):
+    soup = make_soup(html, parser)
+    return dict(parse_listing_fields(soup), photo_url=find_primary_photo_url(soup))
+
+
+def test_lxml_extracts_the_same_record_as_html_parser():
+    pytest.importorskip('lxml')
+    with open(PAGE, 'r', encoding='utf-8') as f:
+        html = f.read()
+
+    record = extract(html, 'lxml')
+
+    assert record == extract(html, FALLBACK_PARSER)
+    assert record['price'] and record['address']
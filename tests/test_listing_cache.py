@@ -0,0 +1,37 @@
+from listing_cache import ListingCache
+
+
+def test_record_read_before_a_sync_that_saw_a_later_write_is_not_cached(store):
+    store.save('111', {'centris_id': '111', 'price': 400000})
+    cache = ListingCache(store, check_interval=0)
+    cache.get('112')
+    read = store.get
+
+    def get_then_write_elsewhere(centris_id):
+        # Another process rewrites the listing right after this read, and
+        # another thread's sync goes past that write before the read is cached
+        record = read(centris_id)
+        store.save('111', {'centris_id': '111', 'price': 390000})
+        cache._sync()
+        return record
+
+    store.get = get_then_write_elsewhere
+    assert cache.get('111')['price'] == 400000
+    store.get = read
+
+    assert cache.get('111')['price'] == 390000
+
+
+def test_own_writes_stay_cached_and_later_writes_evict_them(store):
+    cache = ListingCache(store, check_interval=0)
+    data = {'centris_id': '111', 'price': 400000}
+    cache.put('111', data, store.save('111', data))
+
+    assert cache.get('111')['price'] == 400000
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 0
+
+    # Written by another process
+    store.save('111', {'centris_id': '111', 'price': 390000})
+    assert cache.get('111')['price'] == 390000
+    assert cache.stats()['misses'] == 1
@@ -0,0 +1,43 @@
+from listing_store import SeqWatcher
+
+
+def test_seq_watcher_reports_each_write_once(store):
+    store.save('111', {'centris_id': '111', 'price': 400000})
+    watcher = SeqWatcher(store, check_interval=0)
+
+    assert [record['centris_id'] for _, record in watcher.poll()] == ['111']
+    assert watcher.poll() is None
+
+    store.save('112', {'centris_id': '112', 'price': 500000})
+    store.update('111', {'price': 390000})
+    assert [record['centris_id'] for _, record in watcher.poll()] == ['112', '111']
+    assert watcher.seq == store.max_seq()
+
+
+def test_seq_watcher_checks_at_most_once_per_interval(store):
+    watcher = SeqWatcher(store, check_interval=3600)
+    assert watcher.poll() is None
+
+    store.save('111', {'centris_id': '111', 'price': 400000})
+    assert watcher.poll() is None
+    assert watcher.poll_ids() == []
+    assert not watcher.changed()
+    assert [record['centris_id'] for _, record in watcher.poll(force=True)] == ['111']
+
+
+def test_seq_watcher_without_seq_starts_from_the_latest_write(store):
+    store.save('111', {'centris_id': '111', 'price': 400000})
+    watcher = SeqWatcher(store, check_interval=0, seq=None)
+
+    assert watcher.poll_ids() == []
+    store.save('112', {'centris_id': '112', 'price': 500000})
+    assert [centris_id for _, centris_id in watcher.poll_ids()] == ['112']
+
+
+def test_seq_watcher_changed(store):
+    watcher = SeqWatcher(store, check_interval=0)
+    assert not watcher.changed()
+
+    store.save('111', {'centris_id': '111', 'price': 400000})
+    assert watcher.changed()
+    assert not watcher.changed()